@@ -0,0 +1,28 @@
+"""
+ASGI config for octofit_tracker project.
+
+Serve with any ASGI server, for example:
+    uvicorn octofit_tracker.asgi:application --workers 4
+
+Set OCTOFIT_ASYNC_READS=1 to serve the hot read endpoints from the async
+views in workouts/async_views.py; see `manage.py benchmark_concurrency` to
+compare against a WSGI deployment first. Set OCTOFIT_WARMUP=1 to warm the
+worker at import (see workouts/warmup.py).
+
+Route /api/stats/leaderboard_stream/ to threaded WSGI workers: on Django
+before 4.2 the ASGI handler would iterate the event stream on the event
+loop, so ASGI workers answer it with 503.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'octofit_tracker.settings')
+
+application = get_asgi_application()
+
+if settings.OCTOFIT_WARMUP:
+    from workouts.warmup import warm_up
+    warm_up()
@@ -14,13 +14,31 @@ SECRET_KEY = 'django-insecure-dev-key-change-in-production'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# GitHub Codespaces forwards ports to per-codespace hosts; the frontend runs
+# on port 3000 and this API on port 8000
+CODESPACE_NAME = os.environ.get('CODESPACE_NAME')
+if CODESPACE_NAME:
+    CODESPACE_HOST_3000 = f"https://{CODESPACE_NAME}-3000.app.github.dev"
+    CODESPACE_HOST_8000 = f"https://{CODESPACE_NAME}-8000.app.github.dev"
+
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', 'testserver']
-if os.environ.get('CODESPACE_NAME'):
-    ALLOWED_HOSTS.append(f"{os.environ.get('CODESPACE_NAME')}-8000.app.github.dev")
+if CODESPACE_NAME:
+    ALLOWED_HOSTS.append(f"{CODESPACE_NAME}-8000.app.github.dev")
+
+# Rarely used pieces that cost import and startup time. Workers that do not
+# serve them can turn them off; see `manage.py benchmark_cold_start`.
+OCTOFIT_ADMIN = os.environ.get('OCTOFIT_ADMIN', '1') == '1'
+OCTOFIT_BROWSABLE_API = os.environ.get('OCTOFIT_BROWSABLE_API', '1' if DEBUG else '0') == '1'
+# The frontend logs in through /api-auth/login/
+OCTOFIT_API_AUTH_URLS = os.environ.get('OCTOFIT_API_AUTH_URLS', '1') == '1'
+
+# Warm imports, caches and the first query before serving (see workouts/warmup.py)
+OCTOFIT_WARMUP = os.environ.get('OCTOFIT_WARMUP', '') == '1'
+# Time from process start to the first successful request, in milliseconds
+OCTOFIT_COLD_START_BUDGET_MS = float(os.environ.get('OCTOFIT_COLD_START_BUDGET_MS', '2000'))
 
 # Application definition
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -30,8 +48,14 @@ INSTALLED_APPS = [
     'corsheaders',
     'workouts',
 ]
+if OCTOFIT_ADMIN:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
 
 MIDDLEWARE = [
+    # Removes itself at startup unless OCTOFIT_PROFILING['ENABLED'] is set
+    'workouts.profiling.ProfilingMiddleware',
+    # Removes itself at startup unless OCTOFIT_SLOW_QUERIES['ENABLED'] is set
+    'workouts.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -61,6 +85,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'octofit_tracker.wsgi.application'
+ASGI_APPLICATION = 'octofit_tracker.asgi.application'
+
+# Route the hot read endpoints to async views (opt-in, for ASGI deployments)
+OCTOFIT_ASYNC_READS = os.environ.get('OCTOFIT_ASYNC_READS', '') == '1'
 
 # Database - MongoDB via Djongo
 DATABASES = {
@@ -117,6 +145,114 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if OCTOFIT_BROWSABLE_API else []),
+}
+
+# School (tenant) new users are enrolled in and anonymous readers see
+OCTOFIT_DEFAULT_SCHOOL = os.environ.get('OCTOFIT_DEFAULT_SCHOOL', 'default')
+
+# Request profiling (opt-in, see workouts/profiling.py)
+OCTOFIT_PROFILING = {
+    'ENABLED': os.environ.get('OCTOFIT_PROFILING', '') == '1',
+    # Fraction of requests recorded with cProfile into PROFILE_DIR
+    'PROFILE_SAMPLE_RATE': float(os.environ.get('OCTOFIT_PROFILE_SAMPLE_RATE', '0')),
+    'PROFILE_DIR': os.environ.get('OCTOFIT_PROFILE_DIR', str(BASE_DIR / 'profiles')),
+    'SERVER_TIMING': True,
+}
+
+# Slow-query log (opt-in, see workouts/slow_queries.py)
+OCTOFIT_SLOW_QUERIES = {
+    'ENABLED': os.environ.get('OCTOFIT_SLOW_QUERIES', '') == '1',
+    'THRESHOLD_MS': float(os.environ.get('OCTOFIT_SLOW_QUERY_THRESHOLD_MS', '100')),
+    'MAX_SQL_LENGTH': 4000,
+}
+OCTOFIT_SLOW_QUERY_LOG = os.environ.get('OCTOFIT_SLOW_QUERY_LOG', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_lines': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': OCTOFIT_SLOW_QUERY_LOG,
+            'formatter': 'json_lines',
+        } if OCTOFIT_SLOW_QUERY_LOG else {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json_lines',
+        },
+    },
+    'loggers': {
+        'workouts.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Per-user summary cache (see workouts/cache.py). The LRU tier is per process;
+# generation counters and shared entries live in the CACHES backend, which
+# must be shared (e.g. Redis or Memcached) when running several processes.
+OCTOFIT_SUMMARY_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'LRU_SIZE': 2048,
+    'LRU_TTL': 5,
+    'TTL': 60,
+    'TTL_JITTER': 0.1,
+}
+
+# Server-pushed events (see workouts/events.py and workouts/leaderboards.py).
+# Use 'workouts.events.RedisBroker' with OPTIONS {'url': ...} when running
+# several processes so every process's subscribers receive each broadcast.
+OCTOFIT_EVENTS = {
+    'BACKEND': 'workouts.events.InProcessBroker',
+    'OPTIONS': {},
+    'HEARTBEAT': 15,
+    'LEADERBOARD_TOP_N': 10,
+    'LEADERBOARD_MAX_AGE': 30,
+}
+
+# Hot/cold workout storage: `manage.py archive_workouts` moves workouts older
+# than HORIZON_DAYS to the archive table
+OCTOFIT_ARCHIVE = {
+    'HORIZON_DAYS': int(os.environ.get('OCTOFIT_ARCHIVE_HORIZON_DAYS', '365')),
+}
+
+# Reference data registry (see workouts/reference.py): processes re-check the
+# shared generation every CHECK_INTERVAL seconds; MAX_AGE is the HTTP cache
+# lifetime of /api/workout-types/
+OCTOFIT_REFERENCE = {
+    'CACHE_ALIAS': 'default',
+    'CHECK_INTERVAL': 30,
+    'MAX_AGE': 3600,
+}
+
+# Server-side calorie estimation (see workouts/calories.py)
+OCTOFIT_CALORIES = {
+    'PER_MINUTE': 6.5,
+    'PER_KM': 20.0,
+    'REFERENCE_WEIGHT_KG': 70.0,
+    'MAX_RATIO': 3.0,
+}
+
+# Rate limiting and load shedding (see workouts/throttling.py). Rates are
+# 'N/period' token buckets per client; `shed_writes` is the process-wide
+# write budget. Set CACHE_ALIAS to a shared backend to enforce the per-client
+# rates across processes.
+OCTOFIT_THROTTLING = {
+    'ENABLED': os.environ.get('OCTOFIT_THROTTLING', '1') == '1',
+    'CACHE_ALIAS': None,
+    'RATES': {
+        'writes': '30/min',
+        'leaderboards': '120/min',
+        'exports': '10/hour',
+        'shed_writes': '50/s',
+    },
 }
 
 # CORS Configuration
@@ -128,9 +264,6 @@ CORS_ALLOWED_ORIGINS = [
 # Allow credentials (cookies) for development when using session auth from the frontend
 CORS_ALLOW_CREDENTIALS = True
 
-if os.environ.get('CODESPACE_NAME'):
-    CORS_ALLOWED_ORIGINS.append(f"https://{os.environ.get('CODESPACE_NAME')}-3000.app.github.dev")
-
 # CSRF trusted origins for development (localhost and Codespaces forwarded hosts)
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:3000",
@@ -139,25 +272,18 @@ CSRF_TRUSTED_ORIGINS = [
     "https://localhost:8000",
 ]
 
-codespace_name = os.environ.get('CODESPACE_NAME')
-if codespace_name:
-    host_3000 = f"https://{codespace_name}-3000.app.github.dev"
-    host_8000 = f"https://{codespace_name}-8000.app.github.dev"
-    CORS_ALLOWED_ORIGINS.append(host_3000)
-    CORS_ALLOWED_ORIGINS.append(host_8000)
-    CSRF_TRUSTED_ORIGINS.extend([host_3000, host_8000])
+if CODESPACE_NAME:
+    CORS_ALLOWED_ORIGINS.extend([CODESPACE_HOST_3000, CODESPACE_HOST_8000])
+    CSRF_TRUSTED_ORIGINS.extend([CODESPACE_HOST_3000, CODESPACE_HOST_8000])
 
 # Redirect after login/logout
 LOGIN_REDIRECT_URL = '/api/workouts/'
 LOGOUT_REDIRECT_URL = '/'
 
 # If frontend URL is available (local dev or Codespace), redirect login to frontend UI
-FRONTEND_HOST = os.environ.get('FRONTEND_HOST')
-if not FRONTEND_HOST:
-    if os.environ.get('CODESPACE_NAME'):
-        FRONTEND_HOST = f"https://{os.environ.get('CODESPACE_NAME')}-3000.app.github.dev"
-    else:
-        FRONTEND_HOST = 'http://localhost:3000'
+FRONTEND_HOST = os.environ.get('FRONTEND_HOST') or (
+    CODESPACE_HOST_3000 if CODESPACE_NAME else 'http://localhost:3000'
+)
 
 # Prefer full frontend URL for post-login redirect to bring users back to the React UI
 LOGIN_REDIRECT_URL = FRONTEND_HOST
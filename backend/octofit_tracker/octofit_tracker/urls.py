@@ -1,11 +1,22 @@
 """
 URL configuration for octofit_tracker project.
+
+The admin site and the DRF login views are only imported when enabled
+(OCTOFIT_ADMIN, OCTOFIT_API_AUTH_URLS), keeping them off the startup path
+of workers that do not serve them.
 """
-import os
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from workouts.views import WorkoutViewSet, WorkoutTypeViewSet, UserStatsViewSet, csrf_token_view
+from workouts.views import (
+    WorkoutViewSet,
+    WorkoutTypeViewSet,
+    UserStatsViewSet,
+    csrf_token_view,
+    profiling_stats_view,
+    cache_stats_view,
+    leaderboard_stream_view,
+)
 
 # Initialize router for API endpoints
 router = DefaultRouter()
@@ -13,16 +24,29 @@ router.register(r'workouts', WorkoutViewSet, basename='workout')
 router.register(r'workout-types', WorkoutTypeViewSet, basename='workout-type')
 router.register(r'stats', UserStatsViewSet, basename='stats')
 
-# Codespace environment-aware URL configuration
-codespace_name = os.environ.get('CODESPACE_NAME')
-if codespace_name:
-    base_url = f"https://{codespace_name}-8000.app.github.dev"
-else:
-    base_url = "http://localhost:8000"
-
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/csrf/', csrf_token_view),
+    path('api/internal/profiling/', profiling_stats_view),
+    path('api/internal/cache/', cache_stats_view),
+    path('api/stats/leaderboard_stream/', leaderboard_stream_view),
     path('api/', include(router.urls)),
-    path('api-auth/', include('rest_framework.urls')),
 ]
+
+if settings.OCTOFIT_ADMIN:
+    from django.contrib import admin
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+
+if settings.OCTOFIT_API_AUTH_URLS:
+    urlpatterns.append(path('api-auth/', include('rest_framework.urls')))
+
+if settings.OCTOFIT_ASYNC_READS:
+    # ASGI deployments serve the hot read paths from async views
+    from workouts import async_views
+    urlpatterns = [
+        path('api/workouts/', async_views.workout_list),
+        path('api/workouts/statistics/', async_views.my_stats),
+        path('api/stats/my_stats/', async_views.my_stats),
+        path('api/stats/leaderboard_7days/', async_views.leaderboard_7days),
+        path('api/stats/leaderboard_30days/', async_views.leaderboard_30days),
+        path('api/stats/leaderboard_alltime/', async_views.leaderboard_alltime),
+    ] + urlpatterns
@@ -1,11 +1,19 @@
 """
 WSGI config for octofit_tracker project.
+
+Set OCTOFIT_WARMUP=1 to import the views and run the first queries at import,
+before the server hands the worker any traffic (see workouts/warmup.py).
 """
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'octofit_tracker.settings')
 
 application = get_wsgi_application()
+
+if settings.OCTOFIT_WARMUP:
+    from workouts.warmup import warm_up
+    warm_up()
@@ -1,5 +1,21 @@
 from django.contrib import admin
-from .models import Workout, WorkoutType, UserStats
+from .models import (
+    Workout, WorkoutType, UserStats, UserBadge, School, UserProfile, ArchivedWorkout
+)
+
+@admin.register(School)
+class SchoolAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug', 'created_at']
+    search_fields = ['name', 'slug']
+    prepopulated_fields = {'slug': ('name',)}
+
+
+@admin.register(UserProfile)
+class UserProfileAdmin(admin.ModelAdmin):
+    list_display = ['user', 'school', 'weight_kg']
+    list_filter = ['school']
+    search_fields = ['user__username']
+
 
 @admin.register(WorkoutType)
 class WorkoutTypeAdmin(admin.ModelAdmin):
@@ -9,17 +25,17 @@ class WorkoutTypeAdmin(admin.ModelAdmin):
 
 @admin.register(Workout)
 class WorkoutAdmin(admin.ModelAdmin):
-    list_display = ['user', 'date', 'workout_type', 'duration', 'distance', 'calories', 'created_at']
-    list_filter = ['date', 'workout_type', 'created_at']
+    list_display = ['user', 'school', 'date', 'workout_type', 'duration', 'distance', 'calories', 'created_at']
+    list_filter = ['school', 'date', 'workout_type', 'created_at']
     search_fields = ['user__username', 'notes']
     readonly_fields = ['created_at', 'updated_at']
     
     fieldsets = (
         ('User & Date', {
-            'fields': ('user', 'date')
+            'fields': ('user', 'school', 'date')
         }),
         ('Workout Details', {
-            'fields': ('workout_type', 'duration', 'distance', 'calories')
+            'fields': ('workout_type', 'duration', 'distance', 'calories', 'calories_estimated')
         }),
         ('Notes', {
             'fields': ('notes',)
@@ -31,16 +47,24 @@ class WorkoutAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(ArchivedWorkout)
+class ArchivedWorkoutAdmin(admin.ModelAdmin):
+    list_display = ['user', 'school', 'date', 'workout_type', 'duration', 'distance', 'calories', 'archived_at']
+    list_filter = ['school', 'workout_type']
+    search_fields = ['user__username']
+    readonly_fields = ['archived_at']
+
+
 @admin.register(UserStats)
 class UserStatsAdmin(admin.ModelAdmin):
-    list_display = ['user', 'total_distance_7days', 'total_time_7days', 'total_distance_alltime', 'updated_at']
-    list_filter = ['updated_at']
+    list_display = ['user', 'school', 'total_distance_7days', 'total_time_7days', 'total_distance_alltime', 'updated_at']
+    list_filter = ['school', 'updated_at']
     search_fields = ['user__username']
-    readonly_fields = ['updated_at']
+    readonly_fields = ['updated_at', 'version']
     
     fieldsets = (
         ('User', {
-            'fields': ('user',)
+            'fields': ('user', 'school')
         }),
         ('7-Day Statistics', {
             'fields': ('total_distance_7days', 'total_time_7days', 'workouts_count_7days')
@@ -51,8 +75,28 @@ class UserStatsAdmin(admin.ModelAdmin):
         ('All-Time Statistics', {
             'fields': ('total_distance_alltime', 'total_time_alltime', 'workouts_count_alltime', 'total_calories_alltime')
         }),
+        ('Archived Workouts', {
+            'fields': ('archived_distance', 'archived_time', 'archived_count', 'archived_calories'),
+            'classes': ('collapse',)
+        }),
+        ('Badge Counters', {
+            'fields': (
+                'workouts_count_run', 'workouts_count_walk', 'workouts_count_cycling',
+                'workouts_count_gym', 'streak_last_date', 'streak_current', 'streak_longest',
+                'history_stale'
+            ),
+            'classes': ('collapse',)
+        }),
         ('Metadata', {
-            'fields': ('updated_at',),
+            'fields': ('updated_at', 'version'),
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(UserBadge)
+class UserBadgeAdmin(admin.ModelAdmin):
+    list_display = ['user', 'badge', 'awarded_at']
+    list_filter = ['badge', 'awarded_at']
+    search_fields = ['user__username', 'badge']
+    readonly_fields = ['awarded_at']
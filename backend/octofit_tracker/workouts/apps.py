@@ -5,3 +5,28 @@ class WorkoutsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'workouts'
     verbose_name = 'Workouts'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+        from . import signals, slow_queries
+        from .models import Workout, WorkoutType
+        
+        if slow_queries.get_config()['ENABLED']:
+            connection_created.connect(slow_queries.install, dispatch_uid='workouts.slow_queries')
+        
+        post_save.connect(
+            signals.workout_type_changed,
+            sender=WorkoutType,
+            dispatch_uid='workouts.reference.save'
+        )
+        post_delete.connect(
+            signals.workout_type_changed,
+            sender=WorkoutType,
+            dispatch_uid='workouts.reference.delete'
+        )
+        post_save.connect(
+            signals.workout_saved,
+            sender=Workout,
+            dispatch_uid='workouts.search.save'
+        )
@@ -0,0 +1,119 @@
+"""
+Hot/cold storage of workouts.
+
+Workouts older than the archive horizon (settings.OCTOFIT_ARCHIVE) are moved
+by the `archive_workouts` command from the hot Workout table into
+ArchivedWorkout. Their totals are folded into the archived_* fields of
+UserStats first, so all-time stats keep counting them without scanning the
+archive. Archived rows keep their original id and field values, and history
+reads (`by_date`, `export`) merge both tables when the requested date range
+reaches past the horizon.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ArchivedWorkout, UserStats, Workout
+
+
+DEFAULTS = {
+    'HORIZON_DAYS': 365,
+}
+
+# Rows inside the 30-day window feed the rolling stats and must stay hot
+MIN_HORIZON_DAYS = 31
+
+ARCHIVED_FIELDS = [
+    'id', 'user_id', 'school_id', 'date', 'workout_type', 'duration',
+    'distance', 'calories', 'notes', 'created_at', 'updated_at',
+]
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'OCTOFIT_ARCHIVE', {}))
+    return config
+
+
+def cutoff_date(horizon_days=None, today=None):
+    """Workouts dated before this day belong to the archive."""
+    if horizon_days is None:
+        horizon_days = get_config()['HORIZON_DAYS']
+    today = today or timezone.now().date()
+    return today - timedelta(days=horizon_days)
+
+
+def reaches_archive(start_date):
+    """
+    Whether a history range starting at `start_date` can include archived rows.
+
+    Rows are archived when older than the horizon at archive time, so a
+    range starting on or after today's cutoff never reaches the archive.
+    """
+    if not start_date:
+        return True
+    return str(start_date) < cutoff_date().isoformat()
+
+
+def archive_user(user_id, cutoff):
+    """
+    Move one user's workouts dated before `cutoff` into the archive.
+
+    Returns the number of workouts archived. The archived totals are folded
+    into UserStats in the same transaction as the move, so all-time stats
+    are unchanged by archiving.
+    """
+    old = Workout.objects.filter(user_id=user_id, date__lt=cutoff)
+    rows = list(old.values(*ARCHIVED_FIELDS))
+    if not rows:
+        return 0
+    totals = {
+        'distance': sum(row['distance'] for row in rows),
+        'time': sum(row['duration'] for row in rows),
+        'calories': sum(row['calories'] for row in rows),
+    }
+    ids = [row['id'] for row in rows]
+    with transaction.atomic():
+        ArchivedWorkout.objects.bulk_create(
+            [ArchivedWorkout(**row) for row in rows],
+            ignore_conflicts=True
+        )
+        stats, _ = UserStats.objects.get_or_create(
+            user_id=user_id,
+            defaults={'school_id': rows[0]['school_id']}
+        )
+        # One delta update: no read-modify-write to retry, and the version
+        # bump still makes in-flight compare-and-swap writers re-read
+        UserStats.objects.filter(pk=stats.pk).update(
+            archived_distance=F('archived_distance') + totals['distance'],
+            archived_time=F('archived_time') + totals['time'],
+            archived_count=F('archived_count') + len(rows),
+            archived_calories=F('archived_calories') + totals['calories'],
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+        )
+        Workout.objects.filter(id__in=ids).delete()
+    return len(rows)
+
+
+def history(user, start_date=None, end_date=None):
+    """
+    Workouts of a user in a date range, newest first, from both tables.
+
+    The archive is only queried when the range reaches past the horizon.
+    """
+    filters = {'user': user}
+    if start_date:
+        filters['date__gte'] = start_date
+    if end_date:
+        filters['date__lte'] = end_date
+    workouts = list(Workout.objects.filter(**filters))
+    if reaches_archive(start_date):
+        archived = list(ArchivedWorkout.objects.filter(**filters))
+        if archived:
+            workouts.extend(archived)
+            workouts.sort(key=lambda workout: (workout.date, workout.created_at), reverse=True)
+    return workouts
@@ -0,0 +1,132 @@
+"""
+Async versions of the hot read endpoints.
+
+When OCTOFIT_ASYNC_READS is enabled (ASGI deployments only), these views take
+over the workout list, `statistics`, `my_stats` and the leaderboards. They
+return the same JSON as the DRF views but use Django's async ORM, so a single
+ASGI worker can serve many concurrent pollers instead of parking a thread on
+every Mongo round trip. Requests they do not handle (writes, search) are
+passed on to the regular DRF views.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .cache import summary_cache
+from .models import Workout, UserStats
+from .serializers import WorkoutSerializer, UserStatsSerializer
+from .tenancy import school_id_for_request
+from .throttling import check as check_throttle
+from .views import WorkoutViewSet, leaderboard_limit
+
+
+PAGE_SIZE = 20
+WORKOUT_ORDERINGS = {'date', '-date', 'created_at', '-created_at'}
+
+_workout_list_view = WorkoutViewSet.as_view({'get': 'list', 'post': 'create'})
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+def _not_authenticated():
+    return _json({'detail': 'Authentication credentials were not provided.'}, status=403)
+
+
+def _no_stats():
+    return _json({'detail': 'No statistics found for this user.'}, status=404)
+
+
+async def _authenticated_user(request):
+    user = await sync_to_async(get_user)(request)
+    return user if user.is_authenticated else None
+
+
+async def workout_list(request):
+    """GET /api/workouts/ with the same pagination and ordering as the DRF view."""
+    if request.method != 'GET' or 'search' in request.GET:
+        return await sync_to_async(_workout_list_view)(request)
+
+    user = await _authenticated_user(request)
+    queryset = Workout.objects.none()
+    if user is not None:
+        ordering = request.GET.get('ordering', '-date')
+        if ordering not in WORKOUT_ORDERINGS:
+            ordering = '-date'
+        queryset = Workout.objects.filter(user=user).select_related('user').order_by(ordering)
+
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 0
+    count = await queryset.acount()
+    last_page = max(1, -(-count // PAGE_SIZE))
+    if page < 1 or page > last_page:
+        return _json({'detail': 'Invalid page.'}, status=404)
+
+    offset = (page - 1) * PAGE_SIZE
+    workouts = [workout async for workout in queryset[offset:offset + PAGE_SIZE]]
+    # Type labels come from the reference registry, which may need a (sync) reload
+    results = await sync_to_async(lambda: WorkoutSerializer(workouts, many=True).data)()
+    url = request.build_absolute_uri()
+    if page == 1:
+        previous_url = None
+    elif page == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', page - 1)
+    return _json({
+        'count': count,
+        'next': replace_query_param(url, 'page', page + 1) if page < last_page else None,
+        'previous': previous_url,
+        'results': results,
+    })
+
+
+async def my_stats(request):
+    """GET statistics of the authenticated user (workouts/statistics and stats/my_stats)."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    user = await _authenticated_user(request)
+    if user is None:
+        return _not_authenticated()
+
+    async def compute():
+        stats = await UserStats.objects.select_related('user').filter(user=user).afirst()
+        return dict(UserStatsSerializer(stats).data) if stats else None
+
+    data = await summary_cache.aget_or_compute(user.pk, 'stats', compute)
+    if data is None:
+        return _no_stats()
+    return _json(data)
+
+
+def leaderboard(field):
+    """Build an async leaderboard view ordered by a UserStats field."""
+    async def view(request):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        throttled = await sync_to_async(check_throttle)(request, 'leaderboards')
+        if throttled is not None:
+            return throttled
+        limit = leaderboard_limit(request.GET.get('limit'))
+        if limit is None:
+            return _json({'detail': 'limit must be an integer.'}, status=400)
+        school_id = await sync_to_async(school_id_for_request)(request)
+        if school_id is None:
+            return _json([])
+        queryset = UserStats.objects.filter(school_id=school_id).select_related(
+            'user'
+        ).order_by(f'-{field}')[:limit]
+        rows = [stats async for stats in queryset]
+        return _json(UserStatsSerializer(rows, many=True).data)
+    view.__name__ = f'leaderboard_{field}'
+    return view
+
+
+leaderboard_7days = leaderboard('total_distance_7days')
+leaderboard_30days = leaderboard('total_distance_30days')
+leaderboard_alltime = leaderboard('total_distance_alltime')
@@ -0,0 +1,263 @@
+"""
+Achievement badge rule engine.
+
+Badge rules are declared as plain data in BADGE_RULES and compiled once at
+import time into checks that run against an already-updated UserStats
+snapshot. Every write evaluates all rules: each is a comparison against a
+value already on the row, and the awarded badges are only queried when a
+rule passes.
+
+The per-type counts and the workout streak are kept on UserStats. Creating
+workouts updates them from the written rows (history_fields()), so a write
+does not re-scan the user's history. Updates, deletes, backdated workouts
+and stale counters fall back to one scan of the history.
+"""
+from datetime import timedelta
+from operator import attrgetter
+from collections import namedtuple
+
+from django.db.models import Count
+
+from .models import WORKOUT_CHOICES, Workout, ArchivedWorkout, UserBadge
+
+
+BADGE_RULES = [
+    # Thresholds on UserStats fields
+    {'code': 'first_workout', 'name': 'First Steps', 'icon': '👟',
+     'description': 'Log your first workout.',
+     'kind': 'threshold', 'field': 'workouts_count_alltime', 'value': 1},
+    {'code': 'workouts_50', 'name': 'Regular', 'icon': '📅',
+     'description': 'Log 50 workouts.',
+     'kind': 'threshold', 'field': 'workouts_count_alltime', 'value': 50},
+    {'code': 'busy_week', 'name': 'Busy Week', 'icon': '🔥',
+     'description': 'Log 5 workouts within 7 days.',
+     'kind': 'threshold', 'field': 'workouts_count_7days', 'value': 5},
+    {'code': 'marathon_month', 'name': 'Marathon Month', 'icon': '🏅',
+     'description': 'Cover 42.2 km within 30 days.',
+     'kind': 'threshold', 'field': 'total_distance_30days', 'value': 42.2},
+    {'code': 'distance_100', 'name': 'Century', 'icon': '💯',
+     'description': 'Cover 100 km in total.',
+     'kind': 'threshold', 'field': 'total_distance_alltime', 'value': 100.0},
+    {'code': 'time_1000', 'name': 'Time Keeper', 'icon': '⏱️',
+     'description': 'Train for 1,000 minutes in total.',
+     'kind': 'threshold', 'field': 'total_time_alltime', 'value': 1000},
+    {'code': 'calories_10000', 'name': 'Furnace', 'icon': '⚡',
+     'description': 'Burn 10,000 calories in total.',
+     'kind': 'threshold', 'field': 'total_calories_alltime', 'value': 10000},
+
+    # Consecutive days with at least one workout
+    {'code': 'streak_7', 'name': 'One Week Streak', 'icon': '📈',
+     'description': 'Work out 7 days in a row.',
+     'kind': 'streak', 'days': 7},
+    {'code': 'streak_30', 'name': 'One Month Streak', 'icon': '🏆',
+     'description': 'Work out 30 days in a row.',
+     'kind': 'streak', 'days': 30},
+
+    # Per workout type counts
+    {'code': 'runner_10', 'name': 'Runner', 'icon': '🏃',
+     'description': 'Log 10 runs.',
+     'kind': 'type_count', 'workout_type': 'run', 'value': 10},
+    {'code': 'walker_10', 'name': 'Walker', 'icon': '🚶',
+     'description': 'Log 10 walks.',
+     'kind': 'type_count', 'workout_type': 'walk', 'value': 10},
+    {'code': 'cyclist_10', 'name': 'Cyclist', 'icon': '🚴',
+     'description': 'Log 10 rides.',
+     'kind': 'type_count', 'workout_type': 'cycling', 'value': 10},
+    {'code': 'gym_25', 'name': 'Gym Rat', 'icon': '💪',
+     'description': 'Log 25 gym sessions.',
+     'kind': 'type_count', 'workout_type': 'gym', 'value': 25},
+]
+
+CompiledRule = namedtuple('CompiledRule', ['code', 'check'])
+
+
+TYPE_COUNT_FIELDS = {name: f'workouts_count_{name}' for name, _ in WORKOUT_CHOICES}
+STREAK_FIELDS = ('streak_last_date', 'streak_current', 'streak_longest')
+HISTORY_FIELDS = tuple(TYPE_COUNT_FIELDS.values()) + STREAK_FIELDS
+
+
+def longest_streak(dates):
+    """Return the longest run of consecutive days in an ordered date sequence."""
+    return streak_state(dates)[2]
+
+
+def streak_state(dates, last=None, current=0, longest=0):
+    """
+    Extend a streak with an ascending sequence of dates.
+
+    Returns (last date, length of the run ending on it, longest run).
+    Dates before `last` cannot be folded in; they raise ValueError.
+    """
+    for day in dates:
+        if last is not None and day < last:
+            raise ValueError('Dates must not precede the last date of the streak')
+        if last is not None and day == last:
+            continue
+        if last is not None and day - last == timedelta(days=1):
+            current += 1
+        else:
+            current = 1
+        longest = max(longest, current)
+        last = day
+    return last, current, longest
+
+
+def _history_sources(stats):
+    # The archive is only read for users that have archived workouts
+    if getattr(stats, 'archived_count', 0):
+        return (Workout, ArchivedWorkout)
+    return (Workout,)
+
+
+def scan_history(stats):
+    """Compute the HISTORY_FIELDS of a user from all their workouts (two queries per table)."""
+    counts = dict.fromkeys(TYPE_COUNT_FIELDS, 0)
+    dates = set()
+    for model in _history_sources(stats):
+        rows = model.objects.filter(user_id=stats.user_id).values('workout_type').annotate(
+            count=Count('id')
+        )
+        for row in rows:
+            counts[row['workout_type']] = counts.get(row['workout_type'], 0) + row['count']
+        dates.update(model.objects.filter(user_id=stats.user_id).values_list('date', flat=True))
+    fields = {field: counts[name] for name, field in TYPE_COUNT_FIELDS.items()}
+    fields.update(zip(STREAK_FIELDS, streak_state(sorted(dates))))
+    return fields
+
+
+def history_fields(stats, created=None):
+    """
+    Return the HISTORY_FIELDS of `stats` after a write, and history_stale=False.
+
+    `created` are the workouts just inserted, when the write only created
+    workouts; their types and dates are folded into the stored counters.
+    Without it (updates and deletes), when the counters are stale, when a
+    workout is dated before the streak's last day, or when a workout may
+    already be counted (created before the row was last saved), the history
+    is scanned instead.
+    """
+    fields = {'history_stale': False}
+    incremental = (
+        created
+        and not stats.history_stale
+        and stats.updated_at is not None
+        and all(workout.created_at > stats.updated_at for workout in created)
+    )
+    if incremental:
+        try:
+            state = streak_state(
+                sorted({workout.date for workout in created}),
+                *(getattr(stats, field) for field in STREAK_FIELDS)
+            )
+        except ValueError:
+            incremental = False
+    if not incremental:
+        fields.update(scan_history(stats))
+        return fields
+    fields.update(zip(STREAK_FIELDS, state))
+    for name, field in TYPE_COUNT_FIELDS.items():
+        fields[field] = getattr(stats, field)
+    for workout in created:
+        field = TYPE_COUNT_FIELDS[workout.workout_type]
+        fields[field] += 1
+    return fields
+
+
+class StatsSnapshot:
+    """
+    Read-only view over a freshly saved UserStats row.
+
+    Per-type counts and the streak length are read from the row. Rows whose
+    counters are stale are scanned once, and only when a rule needs them. Callers that already know the values, such as the benchmark,
+    can pass them in to keep evaluation free of database access.
+    """
+
+    def __init__(self, stats, type_counts=None, streak_days=None):
+        self.stats = stats
+        self._type_counts = type_counts
+        self._streak_days = streak_days
+        self._history = None
+
+    def _history_value(self, field):
+        if not self.stats.history_stale:
+            return getattr(self.stats, field)
+        if self._history is None:
+            self._history = scan_history(self.stats)
+        return self._history[field]
+
+    def type_count(self, workout_type):
+        if self._type_counts is not None:
+            return self._type_counts.get(workout_type, 0)
+        field = TYPE_COUNT_FIELDS.get(workout_type)
+        return self._history_value(field) if field else 0
+
+    def streak_days(self):
+        if self._streak_days is not None:
+            return self._streak_days
+        return self._history_value('streak_longest')
+
+
+def _compile_threshold(rule):
+    get_value = attrgetter(rule['field'])
+    value = rule['value']
+    return lambda snapshot: get_value(snapshot.stats) >= value
+
+
+def _compile_streak(rule):
+    days = rule['days']
+    return lambda snapshot: snapshot.streak_days() >= days
+
+
+def _compile_type_count(rule):
+    workout_type = rule['workout_type']
+    value = rule['value']
+    return lambda snapshot: snapshot.type_count(workout_type) >= value
+
+
+COMPILERS = {
+    'threshold': _compile_threshold,
+    'streak': _compile_streak,
+    'type_count': _compile_type_count,
+}
+
+
+def compile_rules(rules):
+    """Compile rule definitions into checks."""
+    compiled = []
+    for rule in rules:
+        try:
+            compiler = COMPILERS[rule['kind']]
+        except KeyError:
+            raise ValueError(f"Unknown badge rule kind {rule['kind']!r} for {rule['code']!r}")
+        compiled.append(CompiledRule(rule['code'], compiler(rule)))
+    return tuple(compiled)
+
+
+BADGES = {rule['code']: rule for rule in BADGE_RULES}
+COMPILED_RULES = compile_rules(BADGE_RULES)
+
+
+def earned(snapshot, rules=COMPILED_RULES, awarded=()):
+    """Return the codes of the rules the snapshot satisfies, skipping awarded ones."""
+    return [rule.code for rule in rules if rule.code not in awarded and rule.check(snapshot)]
+
+
+def evaluate_badges(stats):
+    """
+    Award any badges newly earned by a saved UserStats row.
+
+    Returns the list of newly awarded codes.
+    """
+    satisfied = earned(StatsSnapshot(stats))
+    if not satisfied:
+        return []
+    awarded = set(
+        UserBadge.objects.filter(user_id=stats.user_id).values_list('badge', flat=True)
+    )
+    new_codes = [code for code in satisfied if code not in awarded]
+    if new_codes:
+        UserBadge.objects.bulk_create(
+            [UserBadge(user_id=stats.user_id, badge=code) for code in new_codes],
+            ignore_conflicts=True,
+        )
+    return new_codes
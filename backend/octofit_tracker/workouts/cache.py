@@ -0,0 +1,230 @@
+"""
+Per-user summary cache.
+
+Summaries such as the serialized UserStats of a user are cached in two tiers:
+a bounded in-process LRU in front of Django's cache backend. Keys embed a
+per-user generation counter kept in the cache backend; every workout write
+bumps the counter, which invalidates all of the user's cached summaries in
+O(1) without having to know their keys.
+
+Concurrent misses for the same key are collapsed: threads of one process
+wait on a striped lock, and processes sharing the cache backend take a short
+lock entry with cache.add() so only one of them recomputes the value. Async
+callers (see async_views.py) await the in-flight computation instead.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'LRU_SIZE': 2048,
+    'LRU_TTL': 5,
+    'TTL': 60,
+    'TTL_JITTER': 0.1,
+    'LOCK_TIMEOUT': 5,
+    'LOCK_WAIT': 1.0,
+}
+
+KEY_PREFIX = 'octofit:summary'
+LOCK_STRIPES = 64
+
+_MISSING = object()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'OCTOFIT_SUMMARY_CACHE', {}))
+    return config
+
+
+class LRUTier:
+    """Bounded in-process LRU with a short per-entry TTL."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class UserSummaryCache:
+    """Two-tier, generation-versioned cache for per-user summaries."""
+
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self.lru = LRUTier(self.config['LRU_SIZE'], self.config['LRU_TTL'])
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._counters_lock = threading.Lock()
+        self._inflight = {}
+        self.counters = dict.fromkeys(
+            ['local_hits', 'shared_hits', 'misses', 'coalesced', 'invalidations'], 0
+        )
+
+    @property
+    def backend(self):
+        return caches[self.config['CACHE_ALIAS']]
+
+    def _count(self, name):
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    @staticmethod
+    def _generation_key(user_id):
+        return f'{KEY_PREFIX}:gen:{user_id}'
+
+    def generation(self, user_id):
+        return self.backend.get(self._generation_key(user_id), 0)
+
+    @staticmethod
+    def _key(user_id, name, generation):
+        return f'{KEY_PREFIX}:{name}:{user_id}:{generation}'
+
+    def bump(self, user_id):
+        """Invalidate every cached summary of a user."""
+        key = self._generation_key(user_id)
+        backend = self.backend
+        try:
+            backend.incr(key)
+        except ValueError:
+            # No counter yet: start above the implicit generation 0
+            if not backend.add(key, 1, None):
+                backend.incr(key)
+        self._count('invalidations')
+
+    def _ttl(self):
+        jitter = self.config['TTL_JITTER']
+        return self.config['TTL'] * random.uniform(1 - jitter, 1 + jitter)
+
+    def get_or_compute(self, user_id, name, compute):
+        """Return the cached summary `name` of a user, computing it on a miss."""
+        key = self._key(user_id, name, self.generation(user_id))
+        value = self.lru.get(key)
+        if value is not _MISSING:
+            self._count('local_hits')
+            return value
+        backend = self.backend
+        value = backend.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count('shared_hits')
+            self.lru.set(key, value)
+            return value
+
+        with self._locks[hash(key) % LOCK_STRIPES]:
+            # Another thread may have filled the entry while we waited
+            value = self.lru.get(key)
+            if value is _MISSING:
+                value = backend.get(key, _MISSING)
+            if value is not _MISSING:
+                self._count('coalesced')
+                self.lru.set(key, value)
+                return value
+
+            value = self._compute_once(backend, key, compute)
+            self.lru.set(key, value)
+            return value
+
+    def _compute_once(self, backend, key, compute):
+        lock_key = f'{key}:lock'
+        acquired = backend.add(lock_key, 1, self.config['LOCK_TIMEOUT'])
+        if not acquired:
+            # Another process is computing it; give it a moment before
+            # falling back to computing the value ourselves.
+            deadline = time.monotonic() + self.config['LOCK_WAIT']
+            while time.monotonic() < deadline:
+                time.sleep(0.02)
+                value = backend.get(key, _MISSING)
+                if value is not _MISSING:
+                    self._count('coalesced')
+                    return value
+        try:
+            self._count('misses')
+            value = compute()
+            backend.set(key, value, self._ttl())
+            return value
+        finally:
+            if acquired:
+                backend.delete(lock_key)
+
+    async def aget_or_compute(self, user_id, name, compute):
+        """Async variant of get_or_compute(); `compute` is a coroutine function."""
+        backend = self.backend
+        generation = await backend.aget(self._generation_key(user_id), 0)
+        key = self._key(user_id, name, generation)
+        value = self.lru.get(key)
+        if value is not _MISSING:
+            self._count('local_hits')
+            return value
+        value = await backend.aget(key, _MISSING)
+        if value is not _MISSING:
+            self._count('shared_hits')
+            self.lru.set(key, value)
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._count('coalesced')
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            self._count('misses')
+            value = await compute()
+            await backend.aset(key, value, self._ttl())
+            self.lru.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved when nobody was waiting
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self):
+        with self._counters_lock:
+            counters = dict(self.counters)
+        lookups = counters['local_hits'] + counters['shared_hits'] + counters['coalesced'] + counters['misses']
+        counters['evictions'] = self.lru.evictions
+        counters['local_size'] = len(self.lru)
+        counters['hit_ratio'] = round((lookups - counters['misses']) / lookups, 4) if lookups else None
+        return counters
+
+
+summary_cache = UserSummaryCache()
@@ -0,0 +1,115 @@
+"""
+Server-side calorie estimation.
+
+    calories = multiplier(type) * (weight / REFERENCE_WEIGHT_KG)
+               * (PER_MINUTE * duration + PER_KM * distance)
+
+The multiplier is WorkoutType.default_calories_multiplier, read from the
+reference registry. The weight is the user's UserProfile.weight_kg, and the
+reference weight when the user has not set one.
+
+estimate_many() is the batch entry point: it looks the coefficients up once
+and then runs a single pass over parallel columns, so bulk imports, the
+sample-data generator and `recalculate_calories` estimate any number of rows
+without per-row lookups. Workouts whose calories were filled in here are
+flagged with Workout.calories_estimated, so later recalculations leave
+user-entered values alone.
+"""
+from itertools import repeat
+
+from django.conf import settings
+
+from .models import WORKOUT_CHOICES, UserProfile
+from .reference import workout_types
+
+
+DEFAULTS = {
+    'PER_MINUTE': 6.5,
+    'PER_KM': 20.0,
+    'REFERENCE_WEIGHT_KG': 70.0,
+    # Submitted calories above this multiple of the estimate are rejected
+    'MAX_RATIO': 3.0,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'OCTOFIT_CALORIES', {}))
+    return config
+
+
+def weight_for_user(user):
+    """Return the user's weight in kg, or None; cached on the user object."""
+    if not hasattr(user, '_octofit_weight_kg'):
+        user._octofit_weight_kg = UserProfile.objects.filter(user=user).values_list(
+            'weight_kg', flat=True
+        ).first()
+    return user._octofit_weight_kg
+
+
+def weights_by_user(user_ids=None):
+    """Return {user_id: weight_kg} of the users who have set a weight."""
+    profiles = UserProfile.objects.filter(weight_kg__isnull=False)
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    return dict(profiles.values_list('user_id', 'weight_kg'))
+
+
+def estimate_many(types, durations, distances, weights=None):
+    """
+    Estimate calories for parallel sequences of workout types, durations and distances.
+
+    `weights` is an optional parallel sequence of body weights in kg (None
+    entries use the reference weight). Returns a list of ints.
+    """
+    config = get_config()
+    per_minute = config['PER_MINUTE']
+    per_km = config['PER_KM']
+    reference = config['REFERENCE_WEIGHT_KG']
+    scale = {
+        name: workout_types.calories_multiplier(name) / reference
+        for name, _ in WORKOUT_CHOICES
+    }
+    if weights is None:
+        weights = repeat(None)
+    return [
+        round(scale.get(workout_type, 1.0 / reference) * (weight or reference)
+              * (per_minute * duration + per_km * distance))
+        for workout_type, duration, distance, weight in zip(types, durations, distances, weights)
+    ]
+
+
+def estimate(workout_type, duration, distance, weight=None):
+    return estimate_many([workout_type], [duration], [distance], [weight])[0]
+
+
+def fill_or_validate(items, weight=None):
+    """
+    Fill in missing calories of validated workout dicts and check submitted ones.
+
+    Calories that are absent or zero are replaced by the estimate and the
+    item is flagged `calories_estimated`. Returns a list with, per item, a
+    dict of errors or None when the item is valid.
+    """
+    estimates = estimate_many(
+        [item['workout_type'] for item in items],
+        [item['duration'] for item in items],
+        [item['distance'] for item in items],
+        repeat(weight)
+    )
+    max_ratio = get_config()['MAX_RATIO']
+    errors = []
+    for item, estimated in zip(items, estimates):
+        error = None
+        if not item.get('calories'):
+            item['calories'] = estimated
+            item['calories_estimated'] = True
+        elif item['calories'] > max(estimated, 1) * max_ratio:
+            error = {'calories': [
+                f'{item["calories"]} calories is implausible for this workout '
+                f'(estimated {estimated}).'
+            ]}
+        else:
+            item['calories_estimated'] = False
+        errors.append(error)
+    return errors
@@ -0,0 +1,176 @@
+"""
+Publish/subscribe fan-out for server-pushed events.
+
+The broker is chosen with settings.OCTOFIT_EVENTS['BACKEND']. InProcessBroker
+delivers messages to subscribers of the same process and is the default (and
+the local stand-in for tests and single-process deployments). Multi-process
+deployments can plug in a broker that relays messages between processes,
+such as RedisBroker, which republishes every message to the subscribers of
+each process through a local InProcessBroker.
+"""
+import json
+import queue
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+DEFAULTS = {
+    'BACKEND': 'workouts.events.InProcessBroker',
+    'OPTIONS': {},
+    'SUBSCRIBER_QUEUE_SIZE': 100,
+    'HEARTBEAT': 15,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'OCTOFIT_EVENTS', {}))
+    return config
+
+
+class Subscription:
+    """Queue of messages delivered to one subscriber."""
+
+    def __init__(self, broker, channel, max_size):
+        self.broker = broker
+        self.channel = channel
+        self._queue = queue.Queue(max_size)
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # Slow consumer: drop the oldest message rather than block publishers
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(message)
+
+    def get(self, timeout=None):
+        """Return the next message, or None if none arrived within `timeout` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class BaseBroker:
+    """Interface of the event brokers."""
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def has_subscribers(self, channel):
+        """Whether publishing to `channel` may reach anyone; brokers that cannot tell say True."""
+        return True
+
+
+class InProcessBroker(BaseBroker):
+    """Deliver messages to the subscribers of this process."""
+
+    def __init__(self, subscriber_queue_size=100):
+        self.subscriber_queue_size = subscriber_queue_size
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = tuple(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+        return len(subscribers)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.subscriber_queue_size)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def has_subscribers(self, channel):
+        return self.subscriber_count(channel) > 0
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._channels.get(channel, ()))
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+
+class RedisBroker(BaseBroker):
+    """
+    Relay messages between processes through Redis pub/sub.
+
+    Requires the optional `redis` package. One listener thread per process
+    receives every message once and fans it out to local subscribers.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='octofit:events:',
+                 subscriber_queue_size=100):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('RedisBroker requires the "redis" package')
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+        self.local = InProcessBroker(subscriber_queue_size)
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(**{f'{prefix}*': self._relay})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _relay(self, item):
+        channel = item['channel'].decode()[len(self.prefix):]
+        self.local.publish(channel, json.loads(item['data']))
+
+    def publish(self, channel, message):
+        return self.client.publish(f'{self.prefix}{channel}', json.dumps(message, default=str))
+
+    def subscribe(self, channel):
+        subscription = self.local.subscribe(channel)
+        subscription.broker = self
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.local.unsubscribe(subscription)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured in settings."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = get_config()
+                options = {'subscriber_queue_size': config['SUBSCRIBER_QUEUE_SIZE']}
+                options.update(config['OPTIONS'])
+                _broker = import_string(config['BACKEND'])(**options)
+    return _broker
+
+
+def format_sse(event, data):
+    """Encode one Server-Sent Events message."""
+    return f'event: {event}\ndata: {json.dumps(data, default=str)}\n\n'
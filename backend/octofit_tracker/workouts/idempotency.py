@@ -0,0 +1,110 @@
+"""
+Idempotent workout ingestion.
+
+Clients may send an `Idempotency-Key` header with a workout write. The first
+response for a (user, key) pair is stored and replayed on retries with a
+single indexed lookup, without re-running the write or the stats update.
+
+Independently of keys, workouts are deduplicated on their content
+(user, date, workout_type, duration, distance), which is backed by a unique
+constraint on Workout.
+"""
+import hashlib
+import json
+
+from rest_framework.exceptions import APIException, ErrorDetail
+from rest_framework.response import Response
+
+from .models import IdempotencyKey, Workout
+
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+CONTENT_FIELDS = ('date', 'workout_type', 'duration', 'distance')
+
+
+class DuplicateWorkout(APIException):
+    """A write would make a workout identical to another of the user's workouts."""
+    status_code = 409
+    default_detail = 'An identical workout already exists.'
+    default_code = 'duplicate_workout'
+
+    def __init__(self, duplicate=None):
+        super().__init__()
+        self.detail = {
+            'detail': ErrorDetail(self.default_detail, self.default_code),
+            'duplicate_id': duplicate.pk if duplicate is not None else None,
+        }
+
+
+def get_key(request):
+    """Return the Idempotency-Key sent with the request, if any."""
+    key = request.META.get(HEADER, '').strip()
+    return key[:MAX_KEY_LENGTH] or None
+
+
+def request_hash(request):
+    """Fingerprint of the request payload, used to detect reused keys."""
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.path}\n{payload}'.encode()).hexdigest()
+
+
+def replay(user, key, fingerprint):
+    """Return the stored response for (user, key), or None if it is new."""
+    stored = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if stored is None:
+        return None
+    if stored.request_hash != fingerprint:
+        return Response(
+            {'detail': 'Idempotency-Key was already used with a different request.'},
+            status=422
+        )
+    return Response(
+        json.loads(stored.response_body),
+        status=stored.response_status,
+        headers={REPLAY_HEADER: 'true'}
+    )
+
+
+def store(user, key, fingerprint, response):
+    """Remember the response sent for (user, key)."""
+    IdempotencyKey.objects.get_or_create(
+        user=user,
+        key=key,
+        defaults={
+            'request_hash': fingerprint,
+            'response_status': response.status_code,
+            'response_body': json.dumps(response.data, default=str),
+        }
+    )
+
+
+def content_key(values):
+    """Dedup key of a workout given its field values (model instance or dict)."""
+    if isinstance(values, Workout):
+        return tuple(getattr(values, field) for field in CONTENT_FIELDS)
+    return tuple(values[field] for field in CONTENT_FIELDS)
+
+
+def find_duplicate(user, values):
+    """Return the stored workout with the same content, if any (one indexed lookup)."""
+    return Workout.objects.filter(
+        user=user,
+        **{field: values[field] for field in CONTENT_FIELDS}
+    ).first()
+
+
+def find_duplicates(user, items):
+    """Map content keys of `items` to the workouts of `user` already holding them."""
+    if not items:
+        return {}
+    dates = {item['date'] for item in items}
+    existing = Workout.objects.filter(user=user, date__in=dates)
+    wanted = {content_key(item) for item in items}
+    return {
+        content_key(workout): workout
+        for workout in existing
+        if content_key(workout) in wanted
+    }
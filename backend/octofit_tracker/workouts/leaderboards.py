@@ -0,0 +1,169 @@
+"""
+Live leaderboard tracking.
+
+LeaderboardTracker keeps the current top-N of each school's leaderboards in
+memory.
+When a user's stats change it decides, without a query, whether the change
+can affect a top-N; only then is that board re-read (one query) and the
+difference published once through the event broker. Connected clients
+receive the diff over Server-Sent Events instead of re-polling the
+leaderboard endpoints.
+"""
+import itertools
+import threading
+import time
+
+from django.conf import settings
+
+from .events import get_broker
+from .models import UserStats
+
+
+BOARDS = {
+    '7days': 'total_distance_7days',
+    '30days': 'total_distance_30days',
+    'alltime': 'total_distance_alltime',
+}
+
+def channel(school_id):
+    """Event channel carrying the leaderboard changes of one school."""
+    return f'leaderboard:{school_id}'
+
+
+class LeaderboardTracker:
+    """
+    In-memory top-N of every board, diffed and broadcast on change.
+
+    Boards are re-read after `max_age` seconds so that writes handled by
+    other processes and the sliding 7/30-day windows are picked up.
+
+    Each (school, board) has its own lock, held only to compare and store a
+    board; the re-read itself runs outside it, so writers of different
+    schools or boards never wait on each other or on a query. Every re-read
+    takes a ticket before querying, and a result is only stored (and
+    diffed) if no re-read that started later was stored first.
+    """
+
+    def __init__(self, top_n=None, max_age=None):
+        config = getattr(settings, 'OCTOFIT_EVENTS', {})
+        self.top_n = top_n or config.get('LEADERBOARD_TOP_N', 10)
+        self.max_age = max_age or config.get('LEADERBOARD_MAX_AGE', 30)
+        # (school_id, board name) -> (top, loaded_at, ticket)
+        self._boards = {}
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._tickets = itertools.count(1)
+
+    def _load(self, school_id, field):
+        rows = UserStats.objects.filter(school_id=school_id).order_by(f'-{field}', 'user_id').values(
+            'user_id', 'user__username', field
+        )[:self.top_n]
+        return [
+            {
+                'rank': rank,
+                'user_id': row['user_id'],
+                'username': row['user__username'],
+                'value': row[field],
+            }
+            for rank, row in enumerate(rows, start=1)
+        ]
+
+    def _lock(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._locks_lock:
+                lock = self._locks.setdefault(key, threading.Lock())
+        return lock
+
+    def _reload(self, key):
+        """
+        Re-read a board and store it.
+
+        Returns (top, changes). `changes` is the diff against the previously
+        stored board, or None when a newer re-read was stored meanwhile; the
+        returned top is then that newer board.
+        """
+        ticket = next(self._tickets)
+        top = self._load(key[0], BOARDS[key[1]])
+        with self._lock(key):
+            stored = self._boards.get(key)
+            if stored is not None and stored[2] > ticket:
+                return stored[0], None
+            self._boards[key] = (top, time.monotonic(), ticket)
+        return top, self.diff(stored[0], top) if stored is not None else []
+
+    def board(self, school_id, name):
+        key = (school_id, name)
+        stored = self._boards.get(key)
+        if stored is None or time.monotonic() - stored[1] > self.max_age:
+            return self._reload(key)[0]
+        return stored[0]
+
+    def snapshot(self, school_id):
+        """Return the current top-N of every board of a school."""
+        return {name: list(self.board(school_id, name)) for name in BOARDS}
+
+    def _may_affect(self, top, user_id, value):
+        if len(top) < self.top_n:
+            return True
+        if any(entry['user_id'] == user_id for entry in top):
+            return True
+        return value >= top[-1]['value']
+
+    @staticmethod
+    def diff(old, new):
+        """Describe how a board changed: entries that entered, left or moved."""
+        old_by_user = {entry['user_id']: entry for entry in old}
+        new_by_user = {entry['user_id']: entry for entry in new}
+        changes = []
+        for entry in new:
+            previous = old_by_user.get(entry['user_id'])
+            if previous is None:
+                changes.append({'change': 'entered', **entry})
+            elif previous['rank'] != entry['rank'] or previous['value'] != entry['value']:
+                changes.append({'change': 'moved', 'previous_rank': previous['rank'], **entry})
+        for entry in old:
+            if entry['user_id'] not in new_by_user:
+                changes.append({'change': 'left', **entry})
+        return changes
+
+    def stats_changed(self, stats):
+        """
+        Handle a saved UserStats row; publish one message if any top-N changed.
+
+        Returns the published message, or None when no board changed. Boards
+        are diffed against the stored top-N, so changes made while a board
+        was stale are still published. Without subscribers to the school in
+        this process nothing is re-read; its boards are dropped instead and
+        re-read by the next snapshot.
+        """
+        school_id = stats.school_id
+        broker = get_broker()
+        if not broker.has_subscribers(channel(school_id)):
+            for name in BOARDS:
+                self._boards.pop((school_id, name), None)
+            return None
+        updates = {}
+        now = time.monotonic()
+        for name, field in BOARDS.items():
+            key = (school_id, name)
+            stored = self._boards.get(key)
+            # A stale board cannot rule the change out: it is re-read anyway
+            fresh = stored is not None and now - stored[1] <= self.max_age
+            if fresh and not self._may_affect(stored[0], stats.user_id, getattr(stats, field)):
+                continue
+            new_top, changes = self._reload(key)
+            if changes:
+                updates[name] = {'changes': changes, 'top': new_top}
+        if not updates:
+            return None
+        message = {'school': school_id, 'boards': updates}
+        broker.publish(channel(school_id), message)
+        return message
+
+    def reset(self):
+        """Forget every board; each is re-read on next use."""
+        self._boards.clear()
+
+
+tracker = LeaderboardTracker()
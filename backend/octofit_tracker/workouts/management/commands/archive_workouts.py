@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from workouts import archive
+from workouts.cache import summary_cache
+from workouts.models import Workout
+
+
+class Command(BaseCommand):
+    help = (
+        'Move workouts older than the archive horizon from the hot workout table '
+        'to the archive, folding them into all-time stats'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Archive workouts older than this many days (default: OCTOFIT_ARCHIVE HORIZON_DAYS)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many workouts would be archived'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = archive.get_config()['HORIZON_DAYS']
+        if days < 0:
+            raise CommandError('--days must not be negative')
+        if days < archive.MIN_HORIZON_DAYS:
+            raise CommandError(
+                f'The horizon must be at least {archive.MIN_HORIZON_DAYS} days '
+                'so that the 7 and 30 day stats keep reading hot workouts'
+            )
+        cutoff = archive.cutoff_date(days)
+        old = Workout.objects.filter(date__lt=cutoff)
+        user_ids = sorted(set(old.values_list('user_id', flat=True)))
+
+        if options['dry_run']:
+            self.stdout.write(
+                f'{old.count()} workouts of {len(user_ids)} users are dated before {cutoff}'
+            )
+            return
+
+        total = 0
+        for user_id in user_ids:
+            total += archive.archive_user(user_id, cutoff)
+            summary_cache.bump(user_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Archived {total} workouts of {len(user_ids)} users dated before {cutoff}'
+        ))
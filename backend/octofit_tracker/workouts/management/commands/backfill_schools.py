@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from workouts.cache import summary_cache
+from workouts.leaderboards import tracker as leaderboard_tracker
+from workouts.models import School, UserProfile, Workout, UserStats
+from workouts.tenancy import default_school
+
+
+class Command(BaseCommand):
+    help = (
+        'Enroll users in schools and bring the denormalized school of their '
+        'workouts and stats in line with their profile'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--school',
+            help='Slug of the school to move --users into (created if missing)'
+        )
+        parser.add_argument(
+            '--school-name',
+            help='Name used when --school has to be created'
+        )
+        parser.add_argument(
+            '--users',
+            default='',
+            help='Comma-separated usernames to move into --school'
+        )
+
+    def handle(self, *args, **options):
+        usernames = [name for name in options['users'].split(',') if name]
+        if usernames:
+            if not options['school']:
+                raise CommandError('--users requires --school')
+            school, created = School.objects.get_or_create(
+                slug=options['school'],
+                defaults={'name': options['school_name'] or options['school']}
+            )
+            if created:
+                self.stdout.write(f'  Created school: {school.slug}')
+            users = User.objects.filter(username__in=usernames)
+            missing = set(usernames) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f'Unknown users: {", ".join(sorted(missing))}')
+            for user in users:
+                UserProfile.objects.update_or_create(user=user, defaults={'school': school})
+            self.stdout.write(self.style.SUCCESS(f'✓ Moved {len(usernames)} users to {school.slug}'))
+
+        # Users without a profile join the default school
+        fallback = default_school()
+        without_profile = User.objects.filter(profile__isnull=True)
+        enrolled = UserProfile.objects.bulk_create([
+            UserProfile(user=user, school=fallback) for user in without_profile
+        ])
+        if enrolled:
+            self.stdout.write(f'  Enrolled {len(enrolled)} users in {fallback.slug}')
+
+        # Re-partition rows whose school no longer matches their user's profile
+        workouts_moved = 0
+        stats_moved = 0
+        moved_users = set()
+        for school_id, user_ids in self._users_by_school().items():
+            workouts = Workout.objects.filter(user_id__in=user_ids).exclude(school_id=school_id)
+            stats = UserStats.objects.filter(user_id__in=user_ids).exclude(school_id=school_id)
+            moved_users.update(workouts.values_list('user_id', flat=True).distinct())
+            moved_users.update(stats.values_list('user_id', flat=True))
+            workouts_moved += workouts.update(school_id=school_id)
+            stats_moved += stats.update(school_id=school_id)
+        # Rows written before tenancy existed
+        moved_users.update(UserStats.objects.filter(school__isnull=True).values_list('user_id', flat=True))
+        workouts_moved += Workout.objects.filter(school__isnull=True).update(school=fallback)
+        stats_moved += UserStats.objects.filter(school__isnull=True).update(school=fallback)
+
+        # Cached stats and boards still show the moved users in their old
+        # school. Summaries are invalidated through the shared cache backend;
+        # boards of other processes are re-read within LEADERBOARD_MAX_AGE.
+        for user_id in moved_users:
+            summary_cache.bump(user_id)
+        leaderboard_tracker.reset()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Re-partitioned {workouts_moved} workouts and {stats_moved} stats rows'
+        ))
+
+    @staticmethod
+    def _users_by_school():
+        users_by_school = {}
+        for user_id, school_id in UserProfile.objects.values_list('user_id', 'school_id'):
+            users_by_school.setdefault(school_id, []).append(user_id)
+        return users_by_school
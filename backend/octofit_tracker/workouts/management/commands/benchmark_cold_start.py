@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from statistics import median
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+# Runs in a fresh interpreter: import the WSGI application, serve one request
+# through it directly (no server in between) and report wall-clock timestamps
+CHILD_SCRIPT = '''
+import io, json, sys, time
+from octofit_tracker.wsgi import application
+ready = time.time()
+status = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '',
+    'SCRIPT_NAME': '', 'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+    'HTTP_HOST': 'localhost', 'HTTP_ACCEPT': 'application/json',
+    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+    'wsgi.version': (1, 0), 'wsgi.multithread': False, 'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+}
+body = b''.join(application(environ, lambda code, headers: status.append(code)))
+print(json.dumps({'ready': ready, 'responded': time.time(), 'status': status[0], 'body': body[:200].decode(errors='replace')}))
+'''
+
+# Settings overrides per variant; 'default' runs with the current environment
+VARIANTS = {
+    'default': {},
+    'lean': {'OCTOFIT_ADMIN': '0', 'OCTOFIT_BROWSABLE_API': '0', 'OCTOFIT_API_AUTH_URLS': '0'},
+    'warm': {'OCTOFIT_WARMUP': '1'},
+    'lean+warm': {
+        'OCTOFIT_ADMIN': '0', 'OCTOFIT_BROWSABLE_API': '0', 'OCTOFIT_API_AUTH_URLS': '0',
+        'OCTOFIT_WARMUP': '1',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure cold start: the time from spawning a fresh Python process to the first '
+        'successful response of the WSGI application, per configuration variant. Fails '
+        'when a variant\'s median exceeds the budget (OCTOFIT_COLD_START_BUDGET_MS).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Processes started per variant'
+        )
+        parser.add_argument(
+            '--path',
+            default='/api/workout-types/',
+            help='Path of the first request'
+        )
+        parser.add_argument(
+            '--variants',
+            nargs='+',
+            choices=list(VARIANTS),
+            default=list(VARIANTS),
+            help='Configurations to measure'
+        )
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=None,
+            help='Cold-start budget in milliseconds (default: OCTOFIT_COLD_START_BUDGET_MS)'
+        )
+        parser.add_argument(
+            '--importtime',
+            type=int,
+            default=0,
+            metavar='N',
+            help='Also list the N packages that take longest to import in the default variant'
+        )
+
+    def handle(self, *args, **options):
+        budget = options['budget'] or settings.OCTOFIT_COLD_START_BUDGET_MS
+        self.stdout.write(
+            f'{options["runs"]} runs per variant, GET {options["path"]}, budget {budget:.0f} ms'
+        )
+        self.stdout.write(f'{"variant":<12}{"ready ms":>10}{"request ms":>12}{"total ms":>10}')
+
+        over_budget = []
+        for name in options['variants']:
+            samples = [self._run(VARIANTS[name], options['path']) for _ in range(options['runs'])]
+            ready = median(sample['ready_ms'] for sample in samples)
+            request = median(sample['request_ms'] for sample in samples)
+            total = median(sample['total_ms'] for sample in samples)
+            marker = ''
+            if total > budget:
+                over_budget.append(name)
+                marker = '  over budget'
+            self.stdout.write(f'{name:<12}{ready:>10.1f}{request:>12.1f}{total:>10.1f}{marker}')
+
+        if options['importtime']:
+            self._report_imports(options['path'], options['importtime'])
+
+        if over_budget:
+            raise CommandError(
+                f'Cold start over the {budget:.0f} ms budget: {", ".join(over_budget)}'
+            )
+        self.stdout.write(self.style.SUCCESS('All variants within budget'))
+
+    def _spawn(self, overrides, path, python_options=()):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE, **overrides)
+        started = time.time()
+        result = subprocess.run(
+            [sys.executable, *python_options, '-c', CHILD_SCRIPT, path],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Cold-start process failed:\n{result.stderr[-2000:]}')
+        return started, json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def _run(self, overrides, path):
+        started, timings, _ = self._spawn(overrides, path)
+        if not timings['status'].startswith('2'):
+            raise CommandError(
+                f'First request returned {timings["status"]}: {timings["body"]}'
+            )
+        return {
+            'ready_ms': (timings['ready'] - started) * 1000,
+            'request_ms': (timings['responded'] - timings['ready']) * 1000,
+            'total_ms': (timings['responded'] - started) * 1000,
+        }
+
+    def _report_imports(self, path, limit):
+        """List the packages whose imports cost most, from the -X importtime trace."""
+        _, _, stderr = self._spawn({}, path, ('-X', 'importtime'))
+        totals = {}
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            own, _, module = line[len('import time:'):].split('|')
+            # Charge each module's own time to its top-level package
+            package = module.strip().split('.')[0]
+            totals[package] = totals.get(package, 0) + int(own)
+        self.stdout.write(f'\n{"package":<30}{"import ms":>10}')
+        for package, own in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]:
+            self.stdout.write(f'{package:<30}{own / 1000:>10.1f}')
@@ -0,0 +1,172 @@
+from django.core.management.base import BaseCommand, CommandError
+from time import perf_counter
+from urllib.parse import urlsplit
+import asyncio
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test running servers with many concurrent keep-alive clients, e.g. '
+        'to compare WSGI and ASGI deployments:\n'
+        '  gunicorn octofit_tracker.wsgi -w 4 -b 127.0.0.1:8000\n'
+        '  uvicorn octofit_tracker.asgi:application --workers 4 --port 8001\n'
+        '  manage.py benchmark_concurrency --target wsgi=http://127.0.0.1:8000 '
+        '--target asgi=http://127.0.0.1:8001'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            required=True,
+            help='label=base_url of a running server (repeatable)'
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='Request path (repeatable, clients rotate through them)'
+        )
+        parser.add_argument(
+            '--clients',
+            default='100,500,1000',
+            help='Comma-separated concurrency levels'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10.0,
+            help='Seconds to run each concurrency level'
+        )
+        parser.add_argument(
+            '--cookie',
+            default='',
+            help='Cookie header sent with every request (e.g. sessionid=...)'
+        )
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            label, sep, url = target.partition('=')
+            if not sep:
+                raise CommandError(f'--target must be label=url, got {target!r}')
+            parts = urlsplit(url)
+            if parts.scheme != 'http':
+                raise CommandError('Only plain http targets are supported')
+            targets.append((label, parts.hostname, parts.port or 80))
+        paths = options['path'] or [
+            '/api/workouts/',
+            '/api/workouts/statistics/',
+            '/api/stats/leaderboard_7days/',
+        ]
+        levels = [int(level) for level in options['clients'].split(',')]
+
+        results = []
+        for clients in levels:
+            for label, host, port in targets:
+                self.stdout.write(f'Running {label} with {clients} clients...')
+                result = asyncio.run(self._run(
+                    host, port, paths, clients, options['duration'], options['cookie']
+                ))
+                results.append((label, clients, result))
+
+        self.stdout.write('')
+        self.stdout.write(
+            f'{"target":<10}{"clients":>8}{"requests":>10}{"req/s":>10}'
+            f'{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"errors":>8}'
+        )
+        for label, clients, result in results:
+            self.stdout.write(
+                f'{label:<10}{clients:>8}{result["requests"]:>10}{result["rps"]:>10.1f}'
+                f'{result["p50"]:>9.1f}{result["p95"]:>9.1f}{result["p99"]:>9.1f}'
+                f'{result["errors"]:>8}'
+            )
+
+    async def _run(self, host, port, paths, clients, duration, cookie):
+        latencies = []
+        errors = [0]
+        deadline = perf_counter() + duration
+
+        async def client(index):
+            reader = writer = None
+            turn = index
+            while perf_counter() < deadline:
+                path = paths[turn % len(paths)]
+                turn += 1
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(host, port)
+                    start = perf_counter()
+                    keep_alive = await self._request(reader, writer, host, path, cookie)
+                    latencies.append(perf_counter() - start)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    errors[0] += 1
+                    keep_alive = False
+                    await asyncio.sleep(0.05)
+                if not keep_alive and writer is not None:
+                    writer.close()
+                    reader = writer = None
+            if writer is not None:
+                writer.close()
+
+        started = perf_counter()
+        await asyncio.gather(*(client(index) for index in range(clients)))
+        elapsed = perf_counter() - started
+
+        latencies.sort()
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+        return {
+            'requests': len(latencies),
+            'rps': len(latencies) / elapsed,
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'errors': errors[0],
+        }
+
+    @staticmethod
+    async def _request(reader, writer, host, path, cookie):
+        """Send one GET and read the response; returns whether to keep the connection."""
+        headers = f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: application/json\r\n'
+        if cookie:
+            headers += f'Cookie: {cookie}\r\n'
+        writer.write((headers + '\r\n').encode())
+        await writer.drain()
+
+        status_line = await reader.readline()
+        status = int(status_line.split()[1])
+        length = None
+        chunked = False
+        keep_alive = True
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name = name.lower()
+            value = value.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'transfer-encoding' and 'chunked' in value:
+                chunked = True
+            elif name == 'connection' and value == 'close':
+                keep_alive = False
+
+        if chunked:
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif length is not None:
+            await reader.readexactly(length)
+        else:
+            await reader.read()
+            keep_alive = False
+        if status >= 500:
+            raise ValueError(f'HTTP {status}')
+        return keep_alive
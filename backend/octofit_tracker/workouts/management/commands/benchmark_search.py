@@ -0,0 +1,119 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from datetime import timedelta
+from time import perf_counter
+import random
+from django.utils import timezone
+from workouts import search
+from workouts.models import Workout
+
+
+BENCH_USERNAME = 'bench-search'
+
+VOCABULARY = [
+    'morning', 'evening', 'easy', 'tempo', 'interval', 'recovery', 'hills', 'trail',
+    'track', 'long', 'steady', 'legs', 'tired', 'strong', 'windy', 'rain', 'sunny',
+    'cold', 'hot', 'park', 'river', 'city', 'treadmill', 'friends', 'solo', 'race',
+    'personal', 'best', 'sore', 'knee', 'stretching', 'warmup', 'cooldown', 'sprint',
+    'squats', 'deadlift', 'bench', 'press', 'rows', 'core', 'yoga', 'swim', 'commute',
+]
+# Rare words: the selective queries the index is for
+RARE_WORDS = ['marathon', 'marmot', 'zeppelin']
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare notes search through the inverted index with the icontains scan it '
+        'replaces. Seeds one synthetic user (removed afterwards unless --keep).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--notes',
+            type=int,
+            default=1000000,
+            help='Workouts with notes in the synthetic history'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Searches timed per query'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the synthetic data after the run'
+        )
+
+    def handle(self, *args, **options):
+        user = self._seed(options['notes'])
+        try:
+            queries = [
+                ('rare token', 'zeppelin', 'zeppelin'),
+                ('common token', 'tempo', 'tempo'),
+                ('two tokens', 'hills strong', None),
+                ('prefix', 'marm', 'marm'),
+            ]
+            self.stdout.write(
+                f'{"query":<14}{"matches":>9}{"index ms":>11}{"icontains ms":>14}'
+            )
+            for label, query, substring in queries:
+                found = search.filter_workouts(Workout.objects.filter(user=user), user, query)
+                index_ms, index_count = self._time(
+                    lambda: len(list(found.values_list('id', flat=True))), options['repeat']
+                )
+                if substring is None:
+                    scan = Workout.objects.filter(user=user, notes__icontains='hills').filter(
+                        notes__icontains='strong'
+                    )
+                else:
+                    scan = Workout.objects.filter(user=user, notes__icontains=substring)
+                scan_ms, _ = self._time(
+                    lambda: len(list(scan.values_list('id', flat=True))), options['repeat']
+                )
+                self.stdout.write(
+                    f'{label:<14}{index_count:>9}{index_ms:>11.2f}{scan_ms:>14.2f}'
+                )
+        finally:
+            if not options['keep']:
+                User.objects.filter(username=BENCH_USERNAME).delete()
+
+    @staticmethod
+    def _time(run, repeat):
+        result = run()  # warm up
+        start = perf_counter()
+        for _ in range(repeat):
+            run()
+        return (perf_counter() - start) / repeat * 1000, result
+
+    def _seed(self, count):
+        rng = random.Random(42)
+        User.objects.filter(username=BENCH_USERNAME).delete()
+        user = User.objects.create(username=BENCH_USERNAME)
+        today = timezone.now().date()
+        types = [choice for choice, _ in Workout.WORKOUT_CHOICES]
+        batch = 10000
+        for start in range(0, count, batch):
+            workouts = []
+            for number in range(start, min(start + batch, count)):
+                words = rng.sample(VOCABULARY, rng.randint(3, 8))
+                if rng.random() < 0.001:
+                    words.append(rng.choice(RARE_WORDS))
+                workouts.append(Workout(
+                    user=user,
+                    # Unique (date, duration) per row, so no row collides on content
+                    date=today - timedelta(days=number // 600),
+                    workout_type=types[number % len(types)],
+                    duration=number % 600 + 1,
+                    distance=round(rng.uniform(0, 20), 2),
+                    calories=rng.randint(50, 900),
+                    notes=' '.join(words).capitalize(),
+                ))
+            Workout.objects.bulk_create(workouts)
+            if workouts[0].pk is None:
+                # Backends that do not return ids from bulk inserts
+                workouts = list(Workout.objects.filter(user=user, pk__gt=0).order_by('-pk')[:len(workouts)])
+            search.index_workouts(workouts)
+            self.stdout.write(f'  seeded {min(start + batch, count)} workouts')
+        return user
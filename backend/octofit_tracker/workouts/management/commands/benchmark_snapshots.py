@@ -0,0 +1,117 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from datetime import timedelta
+from time import perf_counter
+import random
+import tracemalloc
+from django.utils import timezone
+from workouts import snapshots
+from workouts.models import Workout
+
+
+BENCH_USERNAME = 'bench-snapshot'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare memory and load time of a full workout history read through the ORM '
+        'and through the columnar snapshot. Seeds one synthetic user (removed afterwards '
+        'unless --keep).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workouts',
+            type=int,
+            default=5000,
+            help='Workouts in the synthetic history'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=10,
+            help='Loads timed per path'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the synthetic data after the run'
+        )
+
+    def handle(self, *args, **options):
+        user = self._seed(options['workouts'])
+        try:
+            snapshots.rebuild(user.pk)
+            paths = [
+                ('orm', lambda: self._orm_summary(user)),
+                ('snapshot', lambda: snapshots.summarize(snapshots.load(user.pk))),
+            ]
+            orm_result = paths[0][1]()
+            snapshot_result = paths[1][1]()
+            mismatched = [
+                key for key, value in orm_result.items()
+                if abs(value - snapshot_result[key]) > 1e-6
+            ]
+            if mismatched:
+                self.stdout.write(self.style.WARNING(f'! Results differ on {", ".join(mismatched)}'))
+
+            self.stdout.write(f'{"path":<10}{"load ms":>10}{"peak KiB":>11}')
+            for name, load in paths:
+                elapsed_ms = self._time(load, options['repeat'])
+                peak_kib = self._peak_memory(load) / 1024
+                self.stdout.write(f'{name:<10}{elapsed_ms:>10.2f}{peak_kib:>11.1f}')
+        finally:
+            if not options['keep']:
+                User.objects.filter(username=BENCH_USERNAME).delete()
+
+    @staticmethod
+    def _orm_summary(user):
+        """The analytics path the snapshot replaces: every Workout as a model instance."""
+        since_7 = timezone.now().date() - timedelta(days=7)
+        since_30 = timezone.now().date() - timedelta(days=30)
+        workouts = list(Workout.objects.filter(user=user))
+        return {
+            'total_distance_7days': sum(w.distance for w in workouts if w.date >= since_7),
+            'total_distance_30days': sum(w.distance for w in workouts if w.date >= since_30),
+            'total_distance_alltime': sum(w.distance for w in workouts),
+            'total_time_alltime': sum(w.duration for w in workouts),
+            'workouts_count_alltime': len(workouts),
+            'total_calories_alltime': sum(w.calories for w in workouts),
+        }
+
+    @staticmethod
+    def _time(load, repeat):
+        start = perf_counter()
+        for _ in range(repeat):
+            load()
+        return (perf_counter() - start) / repeat * 1000
+
+    @staticmethod
+    def _peak_memory(load):
+        tracemalloc.start()
+        try:
+            load()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    @staticmethod
+    def _seed(count):
+        rng = random.Random(42)
+        User.objects.filter(username=BENCH_USERNAME).delete()
+        user = User.objects.create(username=BENCH_USERNAME)
+        today = timezone.now().date()
+        types = [choice for choice, _ in Workout.WORKOUT_CHOICES]
+        Workout.objects.bulk_create([
+            Workout(
+                user=user,
+                date=today - timedelta(days=number // 3),
+                workout_type=types[number % len(types)],
+                duration=rng.randint(10, 120),
+                distance=round(rng.uniform(0, 20), 2),
+                calories=rng.randint(50, 900),
+                notes=f'Synthetic workout {number}',
+            )
+            for number in range(count)
+        ], batch_size=1000)
+        return user
@@ -0,0 +1,118 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from time import perf_counter
+import random
+from workouts.models import School, UserProfile, UserStats
+
+
+BENCH_PREFIX = 'bench-tenant-'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark per-school leaderboard cost as the total number of users grows. '
+        'Seeds synthetic schools and users (removed afterwards unless --keep).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users-per-school',
+            type=int,
+            default=200,
+            help='Students in every synthetic school'
+        )
+        parser.add_argument(
+            '--schools',
+            default='5,20,80',
+            help='Comma-separated school counts to measure at (ascending)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Leaderboard queries timed per measurement'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the synthetic data after the run'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        steps = sorted(int(count) for count in options['schools'].split(','))
+        per_school = options['users_per_school']
+        repeat = options['repeat']
+
+        self.stdout.write(
+            f'{"schools":>8}{"total users":>13}{"tenant ms":>11}{"global ms":>11}'
+        )
+        schools = []
+        try:
+            for step in steps:
+                while len(schools) < step:
+                    schools.append(self._seed_school(len(schools), per_school, rng))
+                probe = schools[0]
+                total_users = UserStats.objects.count()
+                tenant_ms = self._time(
+                    lambda: list(UserStats.objects.filter(school=probe).order_by(
+                        '-total_distance_7days'
+                    )[:10].values_list('user_id', flat=True)),
+                    repeat
+                )
+                global_ms = self._time(
+                    lambda: list(UserStats.objects.order_by(
+                        '-total_distance_7days'
+                    )[:10].values_list('user_id', flat=True)),
+                    repeat
+                )
+                self.stdout.write(
+                    f'{step:>8}{total_users:>13}{tenant_ms:>11.3f}{global_ms:>11.3f}'
+                )
+        finally:
+            if not options['keep']:
+                self._cleanup()
+
+    @staticmethod
+    def _time(query, repeat):
+        query()  # warm up
+        start = perf_counter()
+        for _ in range(repeat):
+            query()
+        return (perf_counter() - start) / repeat * 1000
+
+    @staticmethod
+    def _seed_school(index, per_school, rng):
+        school = School.objects.create(
+            name=f'Benchmark School {index}',
+            slug=f'{BENCH_PREFIX}{index}'
+        )
+        users = User.objects.bulk_create([
+            User(username=f'{BENCH_PREFIX}{index}-{number}')
+            for number in range(per_school)
+        ])
+        if users[0].pk is None:
+            # Backends that do not return ids from bulk inserts
+            users = list(User.objects.filter(username__startswith=f'{BENCH_PREFIX}{index}-'))
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, school=school) for user in users
+        ])
+        UserStats.objects.bulk_create([
+            UserStats(
+                user=user,
+                school=school,
+                total_distance_7days=rng.uniform(0, 80),
+                total_distance_30days=rng.uniform(0, 300),
+                total_distance_alltime=rng.uniform(0, 3000),
+            )
+            for user in users
+        ])
+        return school
+
+    @staticmethod
+    def _cleanup():
+        users = User.objects.filter(username__startswith=BENCH_PREFIX)
+        UserStats.objects.filter(user__in=users).delete()
+        UserProfile.objects.filter(user__in=users).delete()
+        users.delete()
+        School.objects.filter(slug__startswith=BENCH_PREFIX).delete()
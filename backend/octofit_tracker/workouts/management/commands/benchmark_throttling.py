@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+import random
+from workouts.throttling import TokenBuckets, get_config, parse_rate
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the cost of a rate-limit check against the in-process token buckets, '
+        'for growing numbers of clients and concurrent threads.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--checks',
+            type=int,
+            default=200000,
+            help='Checks per measurement'
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            nargs='+',
+            default=[100, 10000, 100000],
+            help='Numbers of distinct clients to spread the checks over'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            nargs='+',
+            default=[1, 8],
+            help='Numbers of concurrent threads'
+        )
+
+    def handle(self, *args, **options):
+        config = get_config()
+        capacity, seconds = parse_rate(config['RATES']['writes'])
+        checks = options['checks']
+        self.stdout.write(f'{"clients":>9}{"threads":>9}{"us/check":>10}{"rejected":>10}')
+        for clients in options['clients']:
+            rng = random.Random(42)
+            keys = [f'writes:user:{rng.randrange(clients)}' for _ in range(checks)]
+            for threads in options['threads']:
+                buckets = TokenBuckets(config['SHARDS'], config['MAX_KEYS_PER_SHARD'])
+                share = checks // threads
+
+                def run(part):
+                    rejected = 0
+                    for key in keys[part * share:(part + 1) * share]:
+                        if buckets.consume(key, capacity, capacity / seconds):
+                            rejected += 1
+                    return rejected
+
+                start = perf_counter()
+                with ThreadPoolExecutor(threads) as pool:
+                    rejected = sum(pool.map(run, range(threads)))
+                elapsed = perf_counter() - start
+                self.stdout.write(
+                    f'{clients:>9}{threads:>9}{elapsed / (share * threads) * 1e6:>10.2f}{rejected:>10}'
+                )
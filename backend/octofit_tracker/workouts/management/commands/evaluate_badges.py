@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from workouts.models import UserStats
+from workouts.badges import evaluate_badges
+
+
+class Command(BaseCommand):
+    help = 'Re-evaluate every badge rule for every user (run after adding or changing rules)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of UserStats rows to load per batch'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Re-evaluating badges for all users...')
+        
+        users_checked = 0
+        badges_awarded = 0
+        stats_rows = UserStats.objects.order_by('pk')
+        for stats in stats_rows.iterator(chunk_size=options['batch_size']):
+            badges_awarded += len(evaluate_badges(stats))
+            users_checked += 1
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Checked {users_checked} users, awarded {badges_awarded} new badges'
+        ))
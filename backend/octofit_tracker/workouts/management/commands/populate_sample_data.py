@@ -4,6 +4,10 @@ from django.utils import timezone
 from datetime import timedelta
 import random
 from workouts.models import Workout, WorkoutType, UserStats
+from workouts.tenancy import school_id_for_user
+from workouts import idempotency
+from workouts.calories import estimate_many
+from workouts.views import WorkoutViewSet
 
 
 class Command(BaseCommand):
@@ -64,23 +68,30 @@ class Command(BaseCommand):
         # Define workout templates for each user
         user_workouts = {
             'alice_runner': [
-                {'type': 'run', 'duration': 30, 'distance': 5.0, 'calories': 350},
-                {'type': 'run', 'duration': 45, 'distance': 8.0, 'calories': 550},
-                {'type': 'walk', 'duration': 60, 'distance': 5.0, 'calories': 250},
+                {'type': 'run', 'duration': 30, 'distance': 5.0},
+                {'type': 'run', 'duration': 45, 'distance': 8.0},
+                {'type': 'walk', 'duration': 60, 'distance': 5.0},
             ],
             'bob_cyclist': [
-                {'type': 'cycling', 'duration': 60, 'distance': 20.0, 'calories': 500},
-                {'type': 'cycling', 'duration': 90, 'distance': 35.0, 'calories': 750},
-                {'type': 'gym', 'duration': 45, 'distance': 0.0, 'calories': 400},
+                {'type': 'cycling', 'duration': 60, 'distance': 20.0},
+                {'type': 'cycling', 'duration': 90, 'distance': 35.0},
+                {'type': 'gym', 'duration': 45, 'distance': 0.0},
             ],
             'charlie_gym': [
-                {'type': 'gym', 'duration': 60, 'distance': 0.0, 'calories': 450},
-                {'type': 'gym', 'duration': 75, 'distance': 0.0, 'calories': 550},
-                {'type': 'walk', 'duration': 45, 'distance': 3.5, 'calories': 200},
+                {'type': 'gym', 'duration': 60, 'distance': 0.0},
+                {'type': 'gym', 'duration': 75, 'distance': 0.0},
+                {'type': 'walk', 'duration': 45, 'distance': 3.5},
             ],
         }
         
         # Generate workouts for the last 30 days
+        new_workouts = []
+        # Workouts are unique on their content; skip draws that repeat one
+        # generated earlier or one stored by a previous run
+        seen = set(Workout.objects.filter(
+            user__in=users.values(),
+            date__gte=today - timedelta(days=29)
+        ).values_list('user_id', *idempotency.CONTENT_FIELDS))
         for username, user in users.items():
             templates = user_workouts[username]
             
@@ -96,8 +107,12 @@ class Command(BaseCommand):
                 duration = template['duration'] + random.randint(-10, 10)
                 distance = template['distance'] + random.uniform(-1.0, 1.0)
                 distance = max(0, distance)  # Ensure non-negative
-                calories = template['calories'] + random.randint(-50, 50)
-                calories = max(0, calories)  # Ensure non-negative
+                duration = max(1, duration)
+                
+                key = (user.pk, workout_date, template['type'], duration, distance)
+                if key in seen:
+                    continue
+                seen.add(key)
                 
                 notes = random.choice([
                     'Great workout!',
@@ -110,23 +125,39 @@ class Command(BaseCommand):
                     None
                 ])
                 
-                Workout.objects.create(
+                new_workouts.append(Workout(
                     user=user,
+                    school_id=school_id_for_user(user),
                     date=workout_date,
                     workout_type=template['type'],
-                    duration=max(1, duration),
+                    duration=duration,
                     distance=distance,
-                    calories=int(calories),
+                    calories_estimated=True,
                     notes=notes
-                )
-                workouts_created += 1
+                ))
+        
+        # Estimate calories for all sample workouts in one pass
+        estimates = estimate_many(
+            [workout.workout_type for workout in new_workouts],
+            [workout.duration for workout in new_workouts],
+            [workout.distance for workout in new_workouts]
+        )
+        for workout, calories in zip(new_workouts, estimates):
+            workout.calories = calories
+            workout.save()
+            workouts_created += 1
         
         self.stdout.write(self.style.SUCCESS(f'✓ Created {workouts_created} sample workouts'))
         
         # Recalculate UserStats for all users
         self.stdout.write('Calculating user statistics...')
+        # Through the same path as API writes, so versions, badge counters,
+        # cached summaries and leaderboards follow
+        created = {}
+        for workout in new_workouts:
+            created.setdefault(workout.user_id, []).append(workout)
         for user in users.values():
-            self._update_user_stats(user)
+            WorkoutViewSet._update_user_stats(user, created=created.get(user.pk, []))
         
         self.stdout.write(self.style.SUCCESS('✓ User statistics calculated'))
         
@@ -144,60 +175,3 @@ class Command(BaseCommand):
                 self.stdout.write(f'  All-time: {stats.total_distance_alltime:.1f}km, {stats.total_time_alltime}min, {stats.workouts_count_alltime} workouts, {stats.total_calories_alltime} cal')
             except UserStats.DoesNotExist:
                 self.stdout.write(f'  No stats found for {username}')
-    
-    @staticmethod
-    def _update_user_stats(user):
-        """Recalculate user stats based on workouts."""
-        from django.db.models import Sum, Count
-        
-        today = timezone.now().date()
-        seven_days_ago = today - timedelta(days=7)
-        thirty_days_ago = today - timedelta(days=30)
-        
-        # Calculate 7-day stats
-        workouts_7days = Workout.objects.filter(
-            user=user,
-            date__gte=seven_days_ago
-        )
-        stats_7days = workouts_7days.aggregate(
-            distance=Sum('distance'),
-            time=Sum('duration'),
-            count=Count('id')
-        )
-        
-        # Calculate 30-day stats
-        workouts_30days = Workout.objects.filter(
-            user=user,
-            date__gte=thirty_days_ago
-        )
-        stats_30days = workouts_30days.aggregate(
-            distance=Sum('distance'),
-            time=Sum('duration'),
-            count=Count('id')
-        )
-        
-        # Calculate all-time stats
-        all_workouts = Workout.objects.filter(user=user)
-        stats_alltime = all_workouts.aggregate(
-            distance=Sum('distance'),
-            time=Sum('duration'),
-            count=Count('id'),
-            calories=Sum('calories')
-        )
-        
-        # Update or create UserStats
-        user_stats, _ = UserStats.objects.get_or_create(user=user)
-        user_stats.total_distance_7days = stats_7days['distance'] or 0.0
-        user_stats.total_time_7days = stats_7days['time'] or 0
-        user_stats.workouts_count_7days = stats_7days['count'] or 0
-        
-        user_stats.total_distance_30days = stats_30days['distance'] or 0.0
-        user_stats.total_time_30days = stats_30days['time'] or 0
-        user_stats.workouts_count_30days = stats_30days['count'] or 0
-        
-        user_stats.total_distance_alltime = stats_alltime['distance'] or 0.0
-        user_stats.total_time_alltime = stats_alltime['time'] or 0
-        user_stats.workouts_count_alltime = stats_alltime['count'] or 0
-        user_stats.total_calories_alltime = stats_alltime['calories'] or 0
-        
-        user_stats.save()
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from workouts import search
+from workouts.models import Workout, WorkoutSearchToken
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the notes search index from the stored workouts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Workouts indexed per batch'
+        )
+
+    def handle(self, *args, **options):
+        WorkoutSearchToken.objects.all().delete()
+        workouts = Workout.objects.exclude(notes__isnull=True).exclude(notes='').order_by('pk')
+        indexed = tokens = 0
+        last_pk = 0
+        while True:
+            chunk = list(workouts.filter(pk__gt=last_pk).only('pk', 'user_id', 'notes')[:options['chunk_size']])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            tokens += search.index_workouts(chunk)
+            indexed += len(chunk)
+            self.stdout.write(f'  {indexed} workouts indexed')
+        self.stdout.write(self.style.SUCCESS(f'✓ Indexed {tokens} tokens of {indexed} workouts'))
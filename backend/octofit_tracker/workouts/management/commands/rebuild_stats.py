@@ -0,0 +1,145 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from time import perf_counter
+import json
+import os
+from workouts import rebuild
+from workouts.cache import summary_cache
+from workouts.models import ArchivedWorkout, UserStats, Workout
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute UserStats for every user in chunks, using grouped aggregations '
+        'and a pool of worker processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Users recomputed per grouped aggregation'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes (1 runs the chunks in this process)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='rebuild_stats.checkpoint.json',
+            help='File recording finished chunks, removed after a complete run'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip the chunks recorded in the checkpoint of an interrupted run'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the fields that would change without writing anything'
+        )
+
+    def handle(self, *args, **options):
+        checkpoint_path = options['checkpoint']
+        dry_run = options['dry_run']
+        checkpoint = self._load_checkpoint(checkpoint_path) if options['resume'] else None
+        today = date.fromisoformat(checkpoint['today']) if checkpoint else timezone.now().date()
+        done = [tuple(bounds) for bounds in checkpoint['done']] if checkpoint else []
+
+        user_ids = set(UserStats.objects.values_list('user_id', flat=True))
+        user_ids.update(Workout.objects.values_list('user_id', flat=True).distinct())
+        user_ids.update(ArchivedWorkout.objects.values_list('user_id', flat=True).distinct())
+        pending = [
+            user_id for user_id in sorted(user_ids)
+            if not any(first <= user_id <= last for first, last in done)
+        ]
+        size = options['chunk_size']
+        chunks = [pending[start:start + size] for start in range(0, len(pending), size)]
+        self.stdout.write(
+            f'Rebuilding stats of {len(pending)} users in {len(chunks)} chunks'
+            + (f' ({len(user_ids) - len(pending)} already done)' if done else '')
+            + (' [dry run]' if dry_run else '')
+        )
+
+        checkpoint = {'today': today.isoformat(), 'done': done}
+        started = perf_counter()
+        processed = changed = conflicts = 0
+        for finished, (chunk, result) in enumerate(self._run(chunks, today, dry_run, options['workers']), start=1):
+            processed += result['users']
+            changed += len(result['changed'])
+            conflicts += len(result['conflicts'])
+            if dry_run:
+                self._print_diff(result['changed'])
+            else:
+                for user_id in result['changed']:
+                    summary_cache.bump(user_id)
+                checkpoint['done'].append((chunk[0], chunk[-1]))
+                self._save_checkpoint(checkpoint_path, checkpoint)
+            elapsed = perf_counter() - started
+            remaining = elapsed / finished * (len(chunks) - finished)
+            self.stdout.write(
+                f'[{finished}/{len(chunks)}] {processed} users, {changed} changed, '
+                f'{elapsed:.1f}s elapsed, ~{remaining:.1f}s left'
+            )
+
+        if not dry_run and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        verb = 'would change' if dry_run else 'updated'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Checked {processed} users, {verb} {changed} in {perf_counter() - started:.1f}s'
+        ))
+        if conflicts:
+            self.stdout.write(self.style.WARNING(
+                f'! Skipped {conflicts} users whose stats were updated during the rebuild'
+            ))
+
+    @staticmethod
+    def _run(chunks, today, dry_run, workers):
+        """Yield (chunk, result) as chunks finish."""
+        if workers <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                yield chunk, rebuild.rebuild_chunk(chunk, today, dry_run)
+            return
+        settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'octofit_tracker.settings')
+        # Forked workers must not share this process's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=rebuild.init_worker,
+            initargs=(settings_module,)
+        ) as pool:
+            futures = {
+                pool.submit(rebuild.rebuild_chunk, chunk, today, dry_run): chunk
+                for chunk in chunks
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def _print_diff(self, changed):
+        for user_id, diff in sorted(changed.items()):
+            if not diff:
+                self.stdout.write(f'  user {user_id}: stats row would be created')
+            for field, (stored, recomputed) in diff.items():
+                self.stdout.write(f'  user {user_id}: {field} {stored} -> {recomputed}')
+
+    @staticmethod
+    def _load_checkpoint(path):
+        try:
+            with open(path) as checkpoint_file:
+                return json.load(checkpoint_file)
+        except FileNotFoundError:
+            raise CommandError(f'No checkpoint found at {path}')
+
+    @staticmethod
+    def _save_checkpoint(path, checkpoint):
+        # Write then rename so an interrupted run never leaves a truncated file
+        with open(f'{path}.tmp', 'w') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(f'{path}.tmp', path)
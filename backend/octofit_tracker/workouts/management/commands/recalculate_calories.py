@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from workouts import calories, rebuild
+from workouts.cache import summary_cache
+from workouts.models import Workout, WorkoutSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-estimate server-estimated workout calories (e.g. after changing a '
+        'WorkoutType multiplier) and refresh the affected users\' stats'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Also replace calories entered by users'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Workouts estimated and written per batch'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many workouts would change'
+        )
+
+    def handle(self, *args, **options):
+        workouts = Workout.objects.order_by('pk')
+        if not options['all']:
+            workouts = workouts.filter(calories_estimated=True)
+        weights = calories.weights_by_user()
+        size = options['chunk_size']
+
+        checked = 0
+        changed = 0
+        users = set()
+        last_pk = 0
+        while True:
+            rows = list(workouts.filter(pk__gt=last_pk).values_list(
+                'pk', 'user_id', 'workout_type', 'duration', 'distance', 'calories'
+            )[:size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            pks, user_ids, types, durations, distances, stored = zip(*rows)
+            estimates = calories.estimate_many(
+                types, durations, distances, [weights.get(user_id) for user_id in user_ids]
+            )
+            updates = [
+                Workout(pk=pk, calories=estimated, calories_estimated=True)
+                for pk, estimated, current in zip(pks, estimates, stored)
+                if estimated != current
+            ]
+            users.update(
+                user_id for user_id, estimated, current in zip(user_ids, estimates, stored)
+                if estimated != current
+            )
+            if updates and not options['dry_run']:
+                Workout.objects.bulk_update(updates, ['calories', 'calories_estimated'])
+            checked += len(rows)
+            changed += len(updates)
+            self.stdout.write(f'  {checked} workouts checked, {changed} changed')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {changed} of {checked} workouts of {len(users)} users would change'
+            ))
+            return
+
+        # Calories feed the all-time stats and the history snapshots
+        user_ids = sorted(users)
+        today = timezone.now().date()
+        for start in range(0, len(user_ids), 500):
+            rebuild.rebuild_chunk(user_ids[start:start + 500], today)
+        WorkoutSnapshot.objects.filter(user_id__in=user_ids).delete()
+        for user_id in user_ids:
+            summary_cache.bump(user_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Recalculated {changed} of {checked} workouts, refreshed stats of {len(user_ids)} users'
+        ))
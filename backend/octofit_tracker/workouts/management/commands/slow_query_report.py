@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand, CommandError
+import json
+import re
+
+
+# Collapse literals so the same ORM call groups under one fingerprint
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    sql = _LITERALS.sub('?', sql)
+    sql = _IN_LISTS.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _caller(entry):
+    """The view and action of an entry, else (outside requests) its calling function."""
+    if entry.get('view') or entry.get('action'):
+        return ' '.join(part for part in (entry.get('view'), entry.get('action')) if part)
+    return (entry.get('caller') or 'unknown').rsplit(':', 1)[0]
+
+
+class Command(BaseCommand):
+    help = 'Rank the worst offenders in a slow-query JSON lines log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('log_files', nargs='+', help='Slow-query log files to read')
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Number of entries to show'
+        )
+        parser.add_argument(
+            '--by',
+            choices=['caller', 'query', 'both'],
+            default='both',
+            help='Group by calling code, by SQL fingerprint, or by both'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the ranking as JSON instead of a table'
+        )
+
+    def handle(self, *args, **options):
+        groups = {}
+        skipped = 0
+        for path in options['log_files']:
+            try:
+                log_file = open(path, encoding='utf-8')
+            except OSError as exc:
+                raise CommandError(f'Cannot read {path}: {exc}')
+            with log_file:
+                for line in log_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        skipped += 1
+                        continue
+                    caller = _caller(entry)
+                    query = fingerprint(entry.get('sql', ''))
+                    if options['by'] == 'caller':
+                        key = (caller, '')
+                    elif options['by'] == 'query':
+                        key = ('', query)
+                    else:
+                        key = (caller, query)
+                    group = groups.setdefault(key, {
+                        'caller': key[0],
+                        'query': key[1],
+                        'count': 0,
+                        'total_ms': 0.0,
+                        'max_ms': 0.0,
+                        'frame': None,
+                        'mongo': None,
+                    })
+                    duration = entry.get('duration_ms', 0.0)
+                    group['count'] += 1
+                    group['total_ms'] += duration
+                    if duration >= group['max_ms']:
+                        group['max_ms'] = duration
+                        group['frame'] = entry.get('caller')
+                        group['mongo'] = entry.get('mongo')
+        
+        ranking = sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
+        ranking = ranking[:options['top']]
+        for group in ranking:
+            group['avg_ms'] = round(group['total_ms'] / group['count'], 3)
+            group['total_ms'] = round(group['total_ms'], 3)
+        
+        if options['json']:
+            self.stdout.write(json.dumps(ranking, indent=2, default=str))
+        else:
+            for rank, group in enumerate(ranking, start=1):
+                self.stdout.write(
+                    f"{rank:>3}. total {group['total_ms']:.1f}ms  count {group['count']}  "
+                    f"avg {group['avg_ms']:.1f}ms  max {group['max_ms']:.1f}ms"
+                )
+                if group['caller']:
+                    self.stdout.write(f"     caller: {group['caller']}")
+                if group['frame'] and not group['frame'].startswith(group['caller']):
+                    self.stdout.write(f"     frame:  {group['frame']}")
+                if group['query']:
+                    self.stdout.write(f"     query:  {group['query'][:200]}")
+                if group['mongo']:
+                    self.stdout.write(f"     mongo:  {json.dumps(group['mongo'], default=str)[:200]}")
+        if skipped:
+            self.stderr.write(f'Skipped {skipped} malformed lines')
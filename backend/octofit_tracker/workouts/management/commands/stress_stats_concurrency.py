@@ -0,0 +1,149 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from datetime import timedelta
+from time import perf_counter
+import logging
+import random
+import threading
+from workouts import rebuild
+from workouts.models import UserStats, Workout
+from workouts.views import WorkoutViewSet
+
+
+STRESS_USERNAME = 'stress-stats'
+
+
+class ConflictCounter(logging.Handler):
+    """Count the compare-and-swap conflicts logged by the stats update."""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        with self._lock:
+            self.count += 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent workout writes for one user from many threads and check that '
+        'the final UserStats match a from-scratch recompute'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Concurrent writer threads'
+        )
+        parser.add_argument(
+            '--writes',
+            type=int,
+            default=25,
+            help='Writes per thread'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the synthetic user and workouts after the run'
+        )
+
+    def handle(self, *args, **options):
+        User.objects.filter(username=STRESS_USERNAME).delete()
+        user = User.objects.create(username=STRESS_USERNAME)
+        counter = ConflictCounter()
+        stats_logger = logging.getLogger('workouts.stats')
+        previous_level = stats_logger.level
+        stats_logger.addHandler(counter)
+        stats_logger.setLevel(logging.DEBUG)
+
+        errors = []
+        threads = [
+            threading.Thread(
+                target=self._writer,
+                args=(user.pk, number, options['writes'], errors)
+            )
+            for number in range(options['threads'])
+        ]
+        try:
+            started = perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = perf_counter() - started
+
+            stats = UserStats.objects.get(user=user)
+            expected = rebuild.compute_chunk([user.pk], timezone.now().date())[user.pk]
+            if stats.history_stale:
+                # Marked for a rescan by a writer that lost every retry
+                expected = {
+                    field: value for field, value in expected.items()
+                    if field not in rebuild.TYPE_COUNT_FIELDS + rebuild.STREAK_FIELDS
+                }
+            mismatched = {
+                field: (getattr(stats, field), value)
+                for field, value in expected.items()
+                if rebuild._differs(getattr(stats, field), value)
+            }
+            writes = options['threads'] * options['writes']
+            self.stdout.write(
+                f'{writes} writes from {options["threads"]} threads in {elapsed:.2f}s, '
+                f'{counter.count} compare-and-swap conflicts retried, '
+                f'{len(errors)} failed writes, final version {stats.version}'
+            )
+            for error in errors[:5]:
+                self.stdout.write(self.style.WARNING(f'! {error}'))
+            if mismatched:
+                for field, (stored, recomputed) in mismatched.items():
+                    self.stdout.write(f'  {field}: stored {stored}, recomputed {recomputed}')
+                raise CommandError('Final stats differ from a from-scratch recompute')
+            self.stdout.write(self.style.SUCCESS('✓ Final stats match a from-scratch recompute'))
+        finally:
+            stats_logger.removeHandler(counter)
+            stats_logger.setLevel(previous_level)
+            if not options['keep']:
+                User.objects.filter(username=STRESS_USERNAME).delete()
+
+    @staticmethod
+    def _writer(user_id, number, writes, errors):
+        """Create, edit and delete workouts the way the API write paths do."""
+        rng = random.Random(number)
+        user = User.objects.get(pk=user_id)
+        types = [choice for choice, _ in Workout.WORKOUT_CHOICES]
+        today = timezone.now().date()
+        mine = []
+        try:
+            for step in range(writes):
+                try:
+                    action = rng.random()
+                    if mine and action < 0.15:
+                        workout = mine.pop(rng.randrange(len(mine)))
+                        workout.delete()
+                        WorkoutViewSet._update_user_stats(user)
+                    elif mine and action < 0.3:
+                        workout = rng.choice(mine)
+                        workout.distance = round(workout.distance + rng.uniform(0.1, 5), 2)
+                        workout.save()
+                        WorkoutViewSet._update_user_stats(user)
+                    else:
+                        workout = Workout.objects.create(
+                            user=user,
+                            date=today - timedelta(days=rng.randrange(60)),
+                            workout_type=rng.choice(types),
+                            # Unique per thread and step, so no two rows collide on content
+                            duration=number * writes + step + 1,
+                            distance=round(rng.uniform(0, 20), 2),
+                            calories=rng.randint(50, 900),
+                        )
+                        mine.append(workout)
+                        WorkoutViewSet._update_user_stats(user, created=[workout])
+                except Exception as error:
+                    errors.append(f'thread {number}: {error!r}')
+        finally:
+            connection.close()
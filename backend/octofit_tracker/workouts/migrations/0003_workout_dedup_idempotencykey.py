@@ -0,0 +1,89 @@
+# Generated by Django 4.1.7 on 2026-10-19 10:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from datetime import timedelta
+from django.db.models import Count, Min, Sum
+
+
+def remove_duplicate_workouts(apps, schema_editor):
+    """Keep the oldest of each group of identical workouts before adding the constraint."""
+    Workout = apps.get_model('workouts', 'Workout')
+    UserStats = apps.get_model('workouts', 'UserStats')
+    content = ['user', 'date', 'workout_type', 'duration', 'distance']
+    groups = Workout.objects.values(*content).annotate(
+        keep=Min('id'),
+        copies=Count('id')
+    ).filter(copies__gt=1)
+    affected_users = set()
+    for group in list(groups):
+        keep = group.pop('keep')
+        group.pop('copies')
+        Workout.objects.filter(**group).exclude(id=keep).delete()
+        affected_users.add(group['user'])
+
+    today = django.utils.timezone.now().date()
+    windows = {
+        '7days': today - timedelta(days=7),
+        '30days': today - timedelta(days=30),
+        'alltime': None,
+    }
+    for user_id in affected_users:
+        updates = {}
+        for window, since in windows.items():
+            workouts = Workout.objects.filter(user_id=user_id)
+            if since is not None:
+                workouts = workouts.filter(date__gte=since)
+            totals = workouts.aggregate(
+                distance=Sum('distance'),
+                time=Sum('duration'),
+                count=Count('id'),
+                calories=Sum('calories')
+            )
+            updates[f'total_distance_{window}'] = totals['distance'] or 0.0
+            updates[f'total_time_{window}'] = totals['time'] or 0
+            updates[f'workouts_count_{window}'] = totals['count'] or 0
+        updates['total_calories_alltime'] = totals['calories'] or 0
+        UserStats.objects.filter(user_id=user_id).update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workouts', '0002_userbadge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('request_hash', models.CharField(max_length=64)),
+                ('response_status', models.PositiveSmallIntegerField()),
+                ('response_body', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(remove_duplicate_workouts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='workout',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'workout_type', 'duration', 'distance'), name='unique_workout_content'),
+        ),
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='idempotencykey',
+            index=models.Index(fields=['created_at'], name='workouts_id_created_02aab8_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='idempotencykey',
+            unique_together={('user', 'key')},
+        ),
+    ]
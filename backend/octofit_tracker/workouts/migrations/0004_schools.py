@@ -0,0 +1,92 @@
+# Generated by Django 4.1.7 on 2026-10-19 10:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_default_school(apps, schema_editor):
+    """Put every existing user and their rows into a default school."""
+    School = apps.get_model('workouts', 'School')
+    UserProfile = apps.get_model('workouts', 'UserProfile')
+    Workout = apps.get_model('workouts', 'Workout')
+    UserStats = apps.get_model('workouts', 'UserStats')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    school, _ = School.objects.get_or_create(
+        slug=getattr(settings, 'OCTOFIT_DEFAULT_SCHOOL', 'default'),
+        defaults={'name': 'Default School'}
+    )
+    with_profile = UserProfile.objects.values_list('user_id', flat=True)
+    UserProfile.objects.bulk_create([
+        UserProfile(user_id=user_id, school=school)
+        for user_id in User.objects.exclude(id__in=list(with_profile)).values_list('id', flat=True)
+    ])
+    Workout.objects.filter(school__isnull=True).update(school=school)
+    UserStats.objects.filter(school__isnull=True).update(school=school)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workouts', '0003_workout_dedup_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='School',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='school',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='members', to='workouts.school'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='school',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='user_stats', to='workouts.school'),
+        ),
+        migrations.AddField(
+            model_name='workout',
+            name='school',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='workouts', to='workouts.school'),
+        ),
+        migrations.RunPython(backfill_default_school, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(fields=['school', '-total_distance_7days'], name='workouts_us_school__002c5f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(fields=['school', '-total_distance_30days'], name='workouts_us_school__87add2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(fields=['school', '-total_distance_alltime'], name='workouts_us_school__cdba2e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['school', '-date'], name='workouts_wo_school__4bb255_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.1.7 on 2026-10-19 11:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workouts', '0004_schools'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='archived_calories',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='archived_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='archived_distance',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='archived_time',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ArchivedWorkout',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('workout_type', models.CharField(choices=[('run', 'Running'), ('walk', 'Walking'), ('cycling', 'Cycling'), ('gym', 'Gym')], max_length=20)),
+                ('duration', models.PositiveIntegerField()),
+                ('distance', models.FloatField()),
+                ('calories', models.PositiveIntegerField()),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('school', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_workouts', to='workouts.school')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_workouts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date', '-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedworkout',
+            index=models.Index(fields=['user', '-date'], name='workouts_ar_user_id_d5a4bf_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.7 on 2026-10-19 11:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workouts', '0005_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkoutSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('workout_count', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='workout_snapshot', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.1.7 on 2026-10-19 11:11
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0007_userstats_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='weight_kg',
+            field=models.FloatField(blank=True, help_text='Body weight in kilograms, used to estimate calories', null=True, validators=[django.core.validators.MinValueValidator(20)]),
+        ),
+        migrations.AddField(
+            model_name='workout',
+            name='calories_estimated',
+            field=models.BooleanField(default=False, help_text='Calories were estimated by the server (see workouts/calories.py)'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.7 on 2026-10-19 11:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workouts', '0008_calorie_estimation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkoutSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('workout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='workouts.workout')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='workoutsearchtoken',
+            index=models.Index(fields=['user', 'token', 'workout'], name='workouts_wo_user_id_b13d6b_idx'),
+        ),
+    ]
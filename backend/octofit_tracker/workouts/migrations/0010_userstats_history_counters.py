@@ -0,0 +1,53 @@
+# Generated by Django 4.1.7 on 2026-10-19 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0009_workoutsearchtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='history_stale',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='streak_current',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='streak_last_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='streak_longest',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='workouts_count_cycling',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='workouts_count_gym',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='workouts_count_run',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='workouts_count_walk',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-19 11:39
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0010_userstats_history_counters'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='workout',
+            name='workouts_wo_school__4bb255_idx',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0011_remove_workout_school_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutsnapshot',
+            name='stats_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
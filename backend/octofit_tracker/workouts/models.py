@@ -3,14 +3,55 @@ from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 
+# Workout types known to the code, shared by WorkoutType and Workout. Labels,
+# icons and multipliers of the WorkoutType rows are served by workouts.reference.
+WORKOUT_CHOICES = [
+    ('run', 'Running'),
+    ('walk', 'Walking'),
+    ('cycling', 'Cycling'),
+    ('gym', 'Gym'),
+]
+
+
+class School(models.Model):
+    """A tenant: workouts, stats and leaderboards are partitioned by school."""
+    name = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class UserProfile(models.Model):
+    """Per-user settings, including the school the user belongs to."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile'
+    )
+    school = models.ForeignKey(
+        School,
+        on_delete=models.PROTECT,
+        related_name='members'
+    )
+    weight_kg = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(20)],
+        help_text='Body weight in kilograms, used to estimate calories'
+    )
+    
+    def __str__(self):
+        return f"{self.user.username} @ {self.school}"
+
+
 class WorkoutType(models.Model):
     """Reference model for workout types."""
-    WORKOUT_CHOICES = [
-        ('run', 'Running'),
-        ('walk', 'Walking'),
-        ('cycling', 'Cycling'),
-        ('gym', 'Gym'),
-    ]
+    WORKOUT_CHOICES = WORKOUT_CHOICES
     
     name = models.CharField(
         max_length=50,
@@ -31,18 +72,22 @@ class WorkoutType(models.Model):
 
 class Workout(models.Model):
     """Model for logging individual workouts."""
-    WORKOUT_CHOICES = [
-        ('run', 'Running'),
-        ('walk', 'Walking'),
-        ('cycling', 'Cycling'),
-        ('gym', 'Gym'),
-    ]
+    WORKOUT_CHOICES = WORKOUT_CHOICES
     
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='workouts'
     )
+    # Denormalized from the user's profile so school-wide queries stay in
+    # the school's partition (see workouts/tenancy.py)
+    school = models.ForeignKey(
+        School,
+        on_delete=models.PROTECT,
+        related_name='workouts',
+        null=True,
+        db_index=False
+    )
     date = models.DateField(default=timezone.now)
     workout_type = models.CharField(
         max_length=20,
@@ -60,6 +105,10 @@ class Workout(models.Model):
         validators=[MinValueValidator(0)],
         help_text='Calories burned'
     )
+    calories_estimated = models.BooleanField(
+        default=False,
+        help_text='Calories were estimated by the server (see workouts/calories.py)'
+    )
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -70,6 +119,13 @@ class Workout(models.Model):
             models.Index(fields=['user', '-date']),
             models.Index(fields=['user', 'workout_type']),
         ]
+        constraints = [
+            # Content-based dedup of client retries (see workouts/idempotency.py)
+            models.UniqueConstraint(
+                fields=['user', 'date', 'workout_type', 'duration', 'distance'],
+                name='unique_workout_content'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.get_workout_type_display()} on {self.date}"
@@ -82,6 +138,13 @@ class UserStats(models.Model):
         on_delete=models.CASCADE,
         related_name='stats'
     )
+    school = models.ForeignKey(
+        School,
+        on_delete=models.PROTECT,
+        related_name='user_stats',
+        null=True,
+        db_index=False
+    )
     
     # 7-day stats
     total_distance_7days = models.FloatField(default=0.0)
@@ -99,11 +162,192 @@ class UserStats(models.Model):
     workouts_count_alltime = models.PositiveIntegerField(default=0)
     total_calories_alltime = models.PositiveIntegerField(default=0)
     
+    # Totals of workouts moved to ArchivedWorkout, folded into all-time stats
+    archived_distance = models.FloatField(default=0.0)
+    archived_time = models.PositiveIntegerField(default=0)  # in minutes
+    archived_count = models.PositiveIntegerField(default=0)
+    archived_calories = models.PositiveIntegerField(default=0)
+    
+    # Badge inputs over the full history (live and archived), maintained
+    # incrementally by workout creates (see workouts/badges.py). While
+    # history_stale is set they are unknown and the next write rescans them.
+    workouts_count_run = models.PositiveIntegerField(default=0)
+    workouts_count_walk = models.PositiveIntegerField(default=0)
+    workouts_count_cycling = models.PositiveIntegerField(default=0)
+    workouts_count_gym = models.PositiveIntegerField(default=0)
+    streak_last_date = models.DateField(null=True, blank=True)
+    streak_current = models.PositiveIntegerField(default=0)
+    streak_longest = models.PositiveIntegerField(default=0)
+    history_stale = models.BooleanField(default=True)
+    
     # Tracking
     updated_at = models.DateTimeField(auto_now=True)
+    # Incremented by every write; see compare_and_swap()
+    version = models.PositiveIntegerField(default=0)
     
     class Meta:
         verbose_name_plural = "User Stats"
+        indexes = [
+            # Leaderboards: one school's rows, already in ranking order
+            models.Index(fields=['school', '-total_distance_7days']),
+            models.Index(fields=['school', '-total_distance_30days']),
+            models.Index(fields=['school', '-total_distance_alltime']),
+        ]
     
     def __str__(self):
         return f"Stats for {self.user.username}"
+    
+    def compare_and_swap(self, **fields):
+        """
+        Write `fields` only if the row is still at the version this instance read.
+        
+        Returns False, changing nothing, when another writer got there
+        first; the caller should re-read the row and retry. On success the
+        fields and the new version are applied to this instance too.
+        """
+        fields['updated_at'] = timezone.now()
+        updated = UserStats.objects.filter(pk=self.pk, version=self.version).update(
+            version=self.version + 1,
+            **fields
+        )
+        if not updated:
+            return False
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.version += 1
+        return True
+
+
+class UserBadge(models.Model):
+    """Achievement badge awarded to a user by the badge rule engine."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='badges'
+    )
+    badge = models.CharField(max_length=50)
+    awarded_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-awarded_at']
+        unique_together = [('user', 'badge')]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.badge}"
+
+
+class IdempotencyKey(models.Model):
+    """Response of a workout write, replayed when a client retries with the same key."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys'
+    )
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = [('user', 'key')]
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.key}"
+
+
+class ArchivedWorkout(models.Model):
+    """
+    Workout moved out of the hot Workout table by `archive_workouts`.
+    
+    Keeps the original primary key so archived rows read the same as live ones.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_workouts'
+    )
+    school = models.ForeignKey(
+        School,
+        on_delete=models.PROTECT,
+        related_name='archived_workouts',
+        null=True,
+        db_index=False
+    )
+    date = models.DateField()
+    workout_type = models.CharField(
+        max_length=20,
+        choices=Workout.WORKOUT_CHOICES
+    )
+    duration = models.PositiveIntegerField()
+    distance = models.FloatField()
+    calories = models.PositiveIntegerField()
+    notes = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', '-date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.get_workout_type_display()} on {self.date} (archived)"
+
+
+class WorkoutSnapshot(models.Model):
+    """
+    Columnar copy of a user's full workout history (live and archived).
+    
+    `data` is encoded and decoded by workouts.snapshots; analytics load this
+    one blob instead of materialising every Workout row. `stats_version` is
+    the UserStats version the blob was built at; any write since then bumps
+    that version and makes the blob stale.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='workout_snapshot'
+    )
+    workout_count = models.PositiveIntegerField(default=0)
+    stats_version = models.PositiveIntegerField(default=0)
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.workout_count} workouts"
+
+
+class WorkoutSearchToken(models.Model):
+    """
+    Inverted index of workout notes: one row per distinct token of a note.
+    
+    Maintained by workouts.search on every workout write.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False
+    )
+    workout = models.ForeignKey(
+        Workout,
+        on_delete=models.CASCADE,
+        related_name='search_tokens'
+    )
+    token = models.CharField(max_length=64)
+    
+    class Meta:
+        indexes = [
+            # Exact and prefix lookups of one user's tokens, covering workout_id
+            models.Index(fields=['user', 'token', 'workout']),
+        ]
+    
+    def __str__(self):
+        return f"{self.token} -> {self.workout_id}"
@@ -0,0 +1,214 @@
+"""
+Opt-in request profiling.
+
+ProfilingMiddleware records, per request, the wall time, the number and
+duration of database queries, the time spent in serializers and the response
+size. It adds a Server-Timing header, samples cProfile profiles to disk at a
+configurable rate and aggregates per-endpoint histograms that are exposed by
+the internal profiling stats endpoint.
+
+Profiling is configured through settings.OCTOFIT_PROFILING. When it is
+disabled the middleware removes itself at startup, so the request path does
+not pay for it at all.
+"""
+import cProfile
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+
+DEFAULTS = {
+    'ENABLED': False,
+    'PROFILE_SAMPLE_RATE': 0.0,
+    'PROFILE_DIR': None,
+    'SERVER_TIMING': True,
+}
+
+# Upper bounds (in milliseconds) of the latency histogram buckets
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+
+_current = ContextVar('octofit_request_profile', default=None)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'OCTOFIT_PROFILING', {}))
+    return config
+
+
+class RequestProfile:
+    """Counters collected while a single request is being handled."""
+    __slots__ = ('query_count', 'query_time', 'serializer_time')
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper()
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.query_time += perf_counter() - start
+
+
+def current_profile():
+    """Return the profile of the request being handled, or None when not profiling."""
+    return _current.get()
+
+
+class EndpointStats:
+    """Running totals and a latency histogram for one endpoint."""
+
+    def __init__(self):
+        self.count = 0
+        self.wall_time = 0.0
+        self.max_wall_time = 0.0
+        self.query_count = 0
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+        self.response_bytes = 0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def add(self, wall_time, profile, response_bytes):
+        self.count += 1
+        self.wall_time += wall_time
+        self.max_wall_time = max(self.max_wall_time, wall_time)
+        self.query_count += profile.query_count
+        self.query_time += profile.query_time
+        self.serializer_time += profile.serializer_time
+        self.response_bytes += response_bytes
+        self.buckets[bisect_left(BUCKETS_MS, wall_time * 1000)] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of requests."""
+        target = self.count * fraction
+        seen = 0
+        for bound, hits in zip(BUCKETS_MS, self.buckets):
+            seen += hits
+            if seen >= target:
+                return bound if bound != float('inf') else round(self.max_wall_time * 1000, 3)
+        return 0
+
+    def as_dict(self):
+        count = self.count or 1
+        return {
+            'count': self.count,
+            'avg_ms': round(self.wall_time / count * 1000, 3),
+            'max_ms': round(self.max_wall_time * 1000, 3),
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'avg_queries': round(self.query_count / count, 2),
+            'avg_db_ms': round(self.query_time / count * 1000, 3),
+            'avg_serializer_ms': round(self.serializer_time / count * 1000, 3),
+            'avg_response_bytes': round(self.response_bytes / count),
+            'histogram_ms': {
+                ('+inf' if bound == float('inf') else str(bound)): hits
+                for bound, hits in zip(BUCKETS_MS, self.buckets)
+            },
+        }
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def record(endpoint, wall_time, profile, response_bytes):
+    with _endpoints_lock:
+        stats = _endpoints.get(endpoint)
+        if stats is None:
+            stats = _endpoints[endpoint] = EndpointStats()
+        stats.add(wall_time, profile, response_bytes)
+
+
+def snapshot():
+    """Return the aggregated per-endpoint statistics of this process."""
+    with _endpoints_lock:
+        return {
+            'pid': os.getpid(),
+            'endpoints': {name: stats.as_dict() for name, stats in sorted(_endpoints.items())},
+        }
+
+
+def reset():
+    with _endpoints_lock:
+        _endpoints.clear()
+
+
+class ProfilingMiddleware:
+    """Collect per-request timings; see the module docstring."""
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = float(config['PROFILE_SAMPLE_RATE'])
+        self.profile_dir = config['PROFILE_DIR']
+        self.server_timing = config['SERVER_TIMING']
+        if self.sample_rate > 0 and self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        profiler = self._start_profiler()
+        start = perf_counter()
+        try:
+            with connection.execute_wrapper(profile):
+                response = self.get_response(request)
+        finally:
+            wall_time = perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            _current.reset(token)
+
+        endpoint = self._endpoint_name(request)
+        response_bytes = 0 if response.streaming else len(response.content)
+        record(endpoint, wall_time, profile, response_bytes)
+        if profiler is not None:
+            self._dump_profile(profiler, endpoint)
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'total;dur={wall_time * 1000:.2f}, '
+                f'db;dur={profile.query_time * 1000:.2f};desc="{profile.query_count} queries", '
+                f'serializer;dur={profile.serializer_time * 1000:.2f}'
+            )
+        return response
+
+    def _start_profiler(self):
+        if self.sample_rate <= 0 or not self.profile_dir or random.random() >= self.sample_rate:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this process
+            return None
+        return profiler
+
+    def _dump_profile(self, profiler, endpoint):
+        filename = '{}-{}-{}.prof'.format(
+            endpoint.replace(' ', '_').replace('/', '_'),
+            int(time.time() * 1000),
+            os.getpid(),
+        )
+        profiler.dump_stats(os.path.join(self.profile_dir, filename))
+
+    @staticmethod
+    def _endpoint_name(request):
+        match = getattr(request, 'resolver_match', None)
+        name = match.view_name if match and match.view_name else 'unresolved'
+        return f'{request.method} {name}'
@@ -0,0 +1,203 @@
+"""
+Chunked recomputation of UserStats, used by `manage.py rebuild_stats`.
+
+A chunk of users is recomputed with grouped aggregations: one query per
+stats window (7 days, 30 days, all time), one over the archive and two per
+table for the badge counters, for the whole chunk, instead of several
+aggregates per user. Users with a current workout snapshot take the badge
+counters from it instead (see workouts/snapshots.py). Changed rows are written one by one with a
+version-checked update, so a rebuild never overwrites stats that a writer
+updated meanwhile.
+
+Chunks run in worker processes. Models are imported inside the functions
+because worker processes may import this module before Django is set up;
+init_worker sets Django up and drops any connection inherited through fork
+so that every process opens its own.
+"""
+import os
+from datetime import timedelta
+
+import django
+from django.db import connections
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+
+WINDOW_FIELDS = {
+    '7days': ('total_distance_7days', 'total_time_7days', 'workouts_count_7days'),
+    '30days': ('total_distance_30days', 'total_time_30days', 'workouts_count_30days'),
+}
+ALLTIME_FIELDS = (
+    'total_distance_alltime', 'total_time_alltime', 'workouts_count_alltime',
+    'total_calories_alltime',
+)
+ARCHIVED_FIELDS = ('archived_distance', 'archived_time', 'archived_count', 'archived_calories')
+# Badge inputs, see badges.HISTORY_FIELDS
+TYPE_COUNT_FIELDS = (
+    'workouts_count_run', 'workouts_count_walk', 'workouts_count_cycling', 'workouts_count_gym',
+)
+STREAK_FIELDS = ('streak_last_date', 'streak_current', 'streak_longest')
+STATS_FIELDS = (
+    WINDOW_FIELDS['7days'] + WINDOW_FIELDS['30days'] + ALLTIME_FIELDS + ARCHIVED_FIELDS
+    + TYPE_COUNT_FIELDS + STREAK_FIELDS
+)
+
+
+def init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+    connections.close_all()
+
+
+def _grouped(model, user_ids, since=None):
+    """Sum distance, duration and calories and count rows per user in one query."""
+    queryset = model.objects.filter(user_id__in=user_ids)
+    if since is not None:
+        queryset = queryset.filter(date__gte=since)
+    rows = queryset.values('user_id').annotate(
+        distance=Sum('distance'),
+        time=Sum('duration'),
+        count=Count('id'),
+        calories=Sum('calories')
+    )
+    return {row['user_id']: row for row in rows}
+
+
+def _history(models, user_ids):
+    """Per-type counts and distinct workout dates per user, over live and archived workouts."""
+    type_counts = {}
+    dates = {}
+    for model in models:
+        queryset = model.objects.filter(user_id__in=user_ids)
+        for row in queryset.values('user_id', 'workout_type').annotate(count=Count('id')):
+            counts = type_counts.setdefault(row['user_id'], {})
+            counts[row['workout_type']] = counts.get(row['workout_type'], 0) + row['count']
+        for user_id, day in queryset.values_list('user_id', 'date').distinct():
+            dates.setdefault(user_id, set()).add(day)
+    return type_counts, dates
+
+
+def compute_chunk(user_ids, today, versions=None):
+    """
+    Return the recomputed stats fields of every user in the chunk, by user id.
+
+    `versions` maps user ids to the UserStats version read before; users
+    whose workout snapshot is at that version and holds as many rows as the
+    recomputed count take their per-type counts and streak from it.
+    """
+    from . import snapshots
+    from .badges import streak_state
+    from .models import ArchivedWorkout, Workout
+
+    windows = {
+        '7days': _grouped(Workout, user_ids, today - timedelta(days=7)),
+        '30days': _grouped(Workout, user_ids, today - timedelta(days=30)),
+    }
+    alltime = _grouped(Workout, user_ids)
+    archived = _grouped(ArchivedWorkout, user_ids)
+
+    type_counts, dates = {}, {}
+    for user_id, snapshot in snapshots.load_current(versions or {}).items():
+        count = alltime.get(user_id, {}).get('count') or 0
+        count += archived.get(user_id, {}).get('count') or 0
+        if len(snapshot) == count:
+            type_counts[user_id], dates[user_id] = snapshots.history(snapshot)
+    scanned = [user_id for user_id in user_ids if user_id not in dates]
+    if scanned:
+        scanned_counts, scanned_dates = _history((Workout, ArchivedWorkout), scanned)
+        type_counts.update(scanned_counts)
+        dates.update(scanned_dates)
+
+    empty = {'distance': None, 'time': None, 'count': None, 'calories': None}
+    results = {}
+    for user_id in user_ids:
+        values = {}
+        for window, (distance, time, count) in WINDOW_FIELDS.items():
+            row = windows[window].get(user_id, empty)
+            values[distance] = row['distance'] or 0.0
+            values[time] = row['time'] or 0
+            values[count] = row['count'] or 0
+        live = alltime.get(user_id, empty)
+        old = archived.get(user_id, empty)
+        values['archived_distance'] = old['distance'] or 0.0
+        values['archived_time'] = old['time'] or 0
+        values['archived_count'] = old['count'] or 0
+        values['archived_calories'] = old['calories'] or 0
+        values['total_distance_alltime'] = (live['distance'] or 0.0) + values['archived_distance']
+        values['total_time_alltime'] = (live['time'] or 0) + values['archived_time']
+        values['workouts_count_alltime'] = (live['count'] or 0) + values['archived_count']
+        values['total_calories_alltime'] = (live['calories'] or 0) + values['archived_calories']
+        counts = type_counts.get(user_id, {})
+        for field in TYPE_COUNT_FIELDS:
+            values[field] = counts.get(field[len('workouts_count_'):], 0)
+        values.update(zip(STREAK_FIELDS, streak_state(sorted(dates.get(user_id, ())))))
+        results[user_id] = values
+    return results
+
+
+def _differs(old, new):
+    if isinstance(new, float) or isinstance(old, float):
+        return abs((old or 0) - (new or 0)) > 1e-9
+    return old != new
+
+
+def rebuild_chunk(user_ids, today, dry_run=False):
+    """
+    Recompute and (unless `dry_run`) save the stats of a chunk of users.
+
+    Returns a dict with the users whose stats changed and, per changed user,
+    the differing fields as {field: [stored, recomputed]}. `conflicts` lists
+    the users skipped because a writer updated their stats during the
+    rebuild; those rows already reflect that write.
+    """
+    from .models import UserProfile, UserStats
+    from .tenancy import default_school
+
+    # Read the rows (and their versions) before the workouts: a write that
+    # commits in between bumps the version and the row is skipped below
+    existing = {stats.user_id: stats for stats in UserStats.objects.filter(user_id__in=user_ids)}
+    computed = compute_chunk(
+        user_ids, today, {stats.user_id: stats.version for stats in existing.values()}
+    )
+
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if missing:
+        schools = dict(UserProfile.objects.filter(user_id__in=missing).values_list(
+            'user_id', 'school_id'
+        ))
+        fallback = None
+        for user_id in missing:
+            school_id = schools.get(user_id)
+            if school_id is None:
+                fallback = fallback or default_school().pk
+                school_id = fallback
+            existing[user_id] = UserStats(user_id=user_id, school_id=school_id)
+
+    diffs = {}
+    changed_rows = []
+    for user_id in user_ids:
+        stats = existing[user_id]
+        diff = {}
+        for field, value in computed[user_id].items():
+            if _differs(getattr(stats, field), value):
+                diff[field] = [getattr(stats, field), value]
+                setattr(stats, field, value)
+        if stats.history_stale:
+            stats.history_stale = False
+            diff.setdefault('history_stale', [True, False])
+        if diff or stats.pk is None:
+            diffs[user_id] = diff
+            changed_rows.append(stats)
+
+    conflicts = []
+    if not dry_run and changed_rows:
+        new_rows = [stats for stats in changed_rows if stats.pk is None]
+        updated_rows = [stats for stats in changed_rows if stats.pk is not None]
+        if new_rows:
+            UserStats.objects.bulk_create(new_rows)
+        for stats in updated_rows:
+            fields = {field: getattr(stats, field) for field in diffs[stats.user_id]}
+            if not stats.compare_and_swap(**fields):
+                conflicts.append(stats.user_id)
+                del diffs[stats.user_id]
+    return {'users': len(user_ids), 'changed': diffs, 'conflicts': conflicts}
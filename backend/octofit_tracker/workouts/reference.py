@@ -0,0 +1,116 @@
+"""
+Process-level registry of reference data.
+
+WorkoutType rows change only through the admin, yet were read on every
+request. The registry loads them once per process and answers lookups
+(labels, icons, calorie multipliers) from memory. Saving or deleting a
+WorkoutType (see signals.py) reloads this process's copy and bumps a
+generation counter in the cache backend. Other processes check that counter
+at most every CHECK_INTERVAL seconds and reload when it moved, so steady-state
+reads cost no database queries.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import WORKOUT_CHOICES, WorkoutType
+
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'CHECK_INTERVAL': 30,
+    'MAX_AGE': 3600,
+}
+
+GENERATION_KEY = 'octofit:reference:workout_types:gen'
+
+CHOICE_LABELS = dict(WORKOUT_CHOICES)
+
+REFERENCE_FIELDS = ['id', 'name', 'display_name', 'icon', 'default_calories_multiplier']
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'OCTOFIT_REFERENCE', {}))
+    return config
+
+
+class WorkoutTypeRegistry:
+    """In-memory copy of the WorkoutType table."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+        self._generation = None
+        self._checked_at = 0.0
+
+    def _cache(self):
+        return caches[get_config()['CACHE_ALIAS']]
+
+    def _load(self):
+        types = list(WorkoutType.objects.all())
+        values = [[getattr(workout_type, field) for field in REFERENCE_FIELDS] for workout_type in types]
+        digest = hashlib.md5(repr(values).encode(), usedforsecurity=False).hexdigest()
+        return {
+            'types': types,
+            'by_name': {workout_type.name: workout_type for workout_type in types},
+            'by_pk': {workout_type.pk: workout_type for workout_type in types},
+            'etag': f'"{digest}"',
+        }
+
+    def _current(self):
+        interval = get_config()['CHECK_INTERVAL']
+        state = self._state
+        if state is not None and time.monotonic() - self._checked_at < interval:
+            return state
+        with self._lock:
+            if self._state is None or time.monotonic() - self._checked_at >= interval:
+                generation = self._cache().get(GENERATION_KEY)
+                if self._state is None or generation != self._generation:
+                    self._state = self._load()
+                    self._generation = generation
+                self._checked_at = time.monotonic()
+            return self._state
+
+    def all(self):
+        return list(self._current()['types'])
+
+    def get(self, name):
+        return self._current()['by_name'].get(name)
+
+    def get_by_pk(self, pk):
+        return self._current()['by_pk'].get(pk)
+
+    @property
+    def etag(self):
+        """Validator of the current data, for HTTP conditional requests."""
+        return self._current()['etag']
+
+    def label(self, name):
+        """Display label of a workout type, falling back to the choice label."""
+        workout_type = self.get(name)
+        if workout_type is not None:
+            return workout_type.display_name
+        return CHOICE_LABELS.get(name, name)
+
+    def calories_multiplier(self, name):
+        workout_type = self.get(name)
+        return workout_type.default_calories_multiplier if workout_type is not None else 1.0
+
+    def invalidate(self):
+        """Reload on next access here, and in other processes on their next check."""
+        cache = self._cache()
+        cache.add(GENERATION_KEY, 0, timeout=None)
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            # Evicted between add() and incr(); any new value is a change
+            cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+        with self._lock:
+            self._state = None
+
+
+workout_types = WorkoutTypeRegistry()
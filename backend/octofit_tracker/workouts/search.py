@@ -0,0 +1,109 @@
+"""
+Search over workout notes through an inverted index.
+
+DRF's SearchFilter turns `?search=` into a case-insensitive substring match,
+which scans every note of the user. Instead, the distinct tokens of each
+note are stored in WorkoutSearchToken, keyed by (user, token). A query is
+split into terms; every term must match (AND). A term matches the tokens it
+starts, so `run` finds "running" as it did with SearchFilter, as a range
+scan of the user's slice of the (user, token, workout) index. Unlike the
+substring match, a term no longer matches inside a word (`unn` does not
+find "running"), and terms shorter than MIN_TOKEN_LENGTH are ignored. A
+trailing `*` is accepted and changes nothing. Each term becomes one
+subquery of workout ids, so no id list is ever built in Python. The same
+table works on SQL backends and on MongoDB through djongo.
+
+The index is maintained on writes: a post_save receiver (see signals.py)
+re-indexes saved workouts, bulk inserts call index_workouts(), and tokens
+are deleted with their workout. Run `manage.py rebuild_search_index` to
+index existing workouts.
+"""
+import re
+
+from rest_framework.filters import BaseFilterBackend
+
+from .models import WorkoutSearchToken
+
+
+TOKEN_RE = re.compile(r'\w+')
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 64
+# Longer notes index their first MAX_TOKENS distinct tokens
+MAX_TOKENS = 100
+
+
+def tokenize(text):
+    """Return the distinct lowercase tokens of a text, in order of appearance."""
+    if not text:
+        return []
+    tokens = {}
+    for token in TOKEN_RE.findall(text.lower()):
+        if len(token) >= MIN_TOKEN_LENGTH:
+            tokens.setdefault(token[:MAX_TOKEN_LENGTH], None)
+            if len(tokens) >= MAX_TOKENS:
+                break
+    return list(tokens)
+
+
+def _token_rows(workouts):
+    return [
+        WorkoutSearchToken(user_id=workout.user_id, workout_id=workout.pk, token=token)
+        for workout in workouts
+        for token in tokenize(workout.notes)
+    ]
+
+
+def index_workouts(workouts, batch_size=5000):
+    """Index the notes of newly created workouts (which must have primary keys)."""
+    rows = _token_rows(workouts)
+    if rows:
+        WorkoutSearchToken.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def reindex_workout(workout, created=False):
+    """Replace the indexed tokens of one workout."""
+    if not created:
+        WorkoutSearchToken.objects.filter(workout_id=workout.pk).delete()
+    index_workouts([workout])
+
+
+def parse_query(query):
+    """Split a query into its distinct terms."""
+    return tokenize(query)
+
+
+def prefix_range(prefix):
+    """
+    Lookup of the tokens starting with `prefix`, as an index range scan.
+    
+    `startswith` becomes LIKE on SQL backends, which SQLite cannot answer
+    from the index; the equivalent half-open range can be.
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return {'token__gte': prefix, 'token__lt': upper}
+
+
+def filter_workouts(queryset, user, query):
+    """Narrow a workout queryset to the user's workouts whose notes match every term of the query."""
+    terms = parse_query(query)
+    if not terms:
+        # Nothing indexable, e.g. only single characters
+        return queryset.none()
+    for term in terms:
+        queryset = queryset.filter(id__in=WorkoutSearchToken.objects.filter(
+            user=user, **prefix_range(term)
+        ).values('workout_id'))
+    return queryset
+
+
+class WorkoutSearchFilter(BaseFilterBackend):
+    """`?search=` over workout notes, answered from the inverted index."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        user = getattr(request, 'user', None)
+        if not query.strip() or user is None or not user.is_authenticated:
+            return queryset
+        return filter_workouts(queryset, user, query)
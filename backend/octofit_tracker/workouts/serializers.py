@@ -1,6 +1,40 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Workout, WorkoutType, UserStats
+from .models import Workout, WorkoutType, UserStats, UserBadge
+from .badges import BADGES
+from . import calories
+from .profiling import current_profile
+from .reference import workout_types
+from time import perf_counter
+
+
+class ProfiledListSerializer(serializers.ListSerializer):
+    """ListSerializer that reports serialization time to the request profiler."""
+    @property
+    def data(self):
+        profile = current_profile()
+        if profile is None:
+            return super().data
+        start = perf_counter()
+        try:
+            return super().data
+        finally:
+            profile.serializer_time += perf_counter() - start
+
+
+class ProfiledModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer that reports serialization time to the request profiler."""
+    @property
+    def data(self):
+        profile = current_profile()
+        if profile is None:
+            return super().data
+        start = perf_counter()
+        try:
+            return super().data
+        finally:
+            profile.serializer_time += perf_counter() - start
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model."""
@@ -10,24 +44,23 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class WorkoutTypeSerializer(serializers.ModelSerializer):
+class WorkoutTypeSerializer(ProfiledModelSerializer):
     """Serializer for WorkoutType model."""
     class Meta:
         model = WorkoutType
+        list_serializer_class = ProfiledListSerializer
         fields = ['id', 'name', 'display_name', 'icon', 'default_calories_multiplier']
         read_only_fields = ['id']
 
 
-class WorkoutSerializer(serializers.ModelSerializer):
+class WorkoutSerializer(ProfiledModelSerializer):
     """Serializer for Workout model."""
     user = UserSerializer(read_only=True)
-    workout_type_display = serializers.CharField(
-        source='get_workout_type_display',
-        read_only=True
-    )
+    workout_type_display = serializers.SerializerMethodField()
     
     class Meta:
         model = Workout
+        list_serializer_class = ProfiledListSerializer
         fields = [
             'id',
             'user',
@@ -37,17 +70,50 @@ class WorkoutSerializer(serializers.ModelSerializer):
             'duration',
             'distance',
             'calories',
+            'calories_estimated',
             'notes',
             'created_at',
             'updated_at'
         ]
-        read_only_fields = ['id', 'user', 'created_at', 'updated_at', 'workout_type_display']
+        read_only_fields = [
+            'id', 'user', 'created_at', 'updated_at', 'workout_type_display', 'calories_estimated'
+        ]
+    
+    def get_workout_type_display(self, obj):
+        return workout_types.label(obj.workout_type)
+
+
+def _request_weight(serializer):
+    """Body weight of the requesting user, for calorie estimation."""
+    request = serializer.context.get('request')
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    return calories.weight_for_user(user)
+
+
+class WorkoutCreateListSerializer(ProfiledListSerializer):
+    """Validates the calories of a whole batch with one estimation pass."""
+    def to_internal_value(self, data):
+        # Checked here rather than in validate(), whose errors DRF nests under
+        # non_field_errors; these keep one entry per submitted item
+        attrs = super().to_internal_value(data)
+        errors = calories.fill_or_validate(attrs, _request_weight(self))
+        if any(errors):
+            raise serializers.ValidationError([error or {} for error in errors])
+        return attrs
 
 
-class WorkoutCreateUpdateSerializer(serializers.ModelSerializer):
-    """Serializer for creating/updating workouts (without nested user)."""
+class WorkoutCreateUpdateSerializer(ProfiledModelSerializer):
+    """
+    Serializer for creating/updating workouts (without nested user).
+    
+    Calories may be omitted (or sent as 0) to have the server estimate them;
+    submitted values far above the estimate are rejected.
+    """
     class Meta:
         model = Workout
+        list_serializer_class = WorkoutCreateListSerializer
         fields = [
             'date',
             'workout_type',
@@ -56,14 +122,38 @@ class WorkoutCreateUpdateSerializer(serializers.ModelSerializer):
             'calories',
             'notes'
         ]
+        extra_kwargs = {'calories': {'required': False}}
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if isinstance(self.parent, serializers.ListSerializer):
+            # Estimated for the whole batch by WorkoutCreateListSerializer
+            return attrs
+        instance = self.instance
+        if instance is not None and 'calories' not in attrs and not instance.calories_estimated:
+            # Keep the calories the user entered
+            return attrs
+        item = {
+            field: attrs.get(field, getattr(instance, field, None))
+            for field in ('workout_type', 'duration', 'distance')
+        }
+        # Re-estimate previously estimated calories when none are submitted
+        item['calories'] = attrs.get('calories')
+        errors = calories.fill_or_validate([item], _request_weight(self))[0]
+        if errors:
+            raise serializers.ValidationError(errors)
+        attrs['calories'] = item['calories']
+        attrs['calories_estimated'] = item['calories_estimated']
+        return attrs
 
 
-class UserStatsSerializer(serializers.ModelSerializer):
+class UserStatsSerializer(ProfiledModelSerializer):
     """Serializer for UserStats model."""
     user = UserSerializer(read_only=True)
     
     class Meta:
         model = UserStats
+        list_serializer_class = ProfiledListSerializer
         fields = [
             'id',
             'user',
@@ -80,3 +170,25 @@ class UserStatsSerializer(serializers.ModelSerializer):
             'updated_at'
         ]
         read_only_fields = fields
+
+
+class UserBadgeSerializer(ProfiledModelSerializer):
+    """Serializer for UserBadge model, enriched with the badge definition."""
+    name = serializers.SerializerMethodField()
+    description = serializers.SerializerMethodField()
+    icon = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UserBadge
+        list_serializer_class = ProfiledListSerializer
+        fields = ['id', 'badge', 'name', 'description', 'icon', 'awarded_at']
+        read_only_fields = fields
+    
+    def get_name(self, obj):
+        return BADGES.get(obj.badge, {}).get('name', obj.badge)
+    
+    def get_description(self, obj):
+        return BADGES.get(obj.badge, {}).get('description', '')
+    
+    def get_icon(self, obj):
+        return BADGES.get(obj.badge, {}).get('icon', '')
@@ -0,0 +1,17 @@
+"""
+Model signal receivers, connected in WorkoutsConfig.ready().
+"""
+from django.db import transaction
+
+from . import search
+from .reference import workout_types
+
+
+def workout_type_changed(sender, **kwargs):
+    """Refresh the WorkoutType registry once the admin change is committed."""
+    transaction.on_commit(workout_types.invalidate)
+
+
+def workout_saved(sender, instance, created, **kwargs):
+    """Keep the notes search index in step with the saved workout."""
+    search.reindex_workout(instance, created=created)
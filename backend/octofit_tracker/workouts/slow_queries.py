@@ -0,0 +1,195 @@
+"""
+Slow-query log.
+
+When enabled through settings.OCTOFIT_SLOW_QUERIES, a wrapper is attached to
+every new database connection. Queries slower than the threshold are written
+to the `workouts.slow_queries` logger as one JSON object per line, together
+with the view and action of the request that ran them (for example
+`stats-leaderboard-alltime` / `leaderboard_alltime`, recorded by
+SlowQueryMiddleware), the nearest workouts frame as secondary detail, the
+SQL text and, on djongo, the Mongo command the SQL was translated into.
+Queries run outside a request (management commands) carry only the frame.
+Use the `slow_query_report` command to rank the worst offenders offline.
+
+djongo only runs a SELECT against Mongo when its rows are first fetched. The
+wrapper therefore opens the Mongo cursor inside the timed region so that the
+recorded time includes the server round trip, not just the SQL translation.
+"""
+import json
+import logging
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'THRESHOLD_MS': 100,
+    'MAX_SQL_LENGTH': 4000,
+}
+
+# Frames from these modules are skipped when looking for the caller, so
+# queries run while serializing are attributed to the view that asked for them
+_IGNORED_MODULES = {__name__, 'workouts.profiling', 'workouts.serializers'}
+
+# (view name, action) of the request being handled
+_view = ContextVar('octofit_slow_query_view', default=None)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'OCTOFIT_SLOW_QUERIES', {}))
+    return config
+
+
+class SlowQueryLogger:
+    """Database execute wrapper logging queries over the threshold."""
+
+    def __init__(self, threshold_ms, max_sql_length):
+        self.threshold = threshold_ms / 1000
+        self.max_sql_length = max_sql_length
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+            if context['connection'].vendor == 'djongo' and not many:
+                _open_djongo_cursor(context)
+            return result
+        finally:
+            duration = perf_counter() - start
+            if duration >= self.threshold:
+                self.log(duration, sql, params, many, context)
+
+    def log(self, duration, sql, params, many, context):
+        view, action = _view.get() or (None, None)
+        entry = {
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'alias': context['connection'].alias,
+            'view': view,
+            'action': action,
+            'caller': find_caller(),
+            'sql': sql[:self.max_sql_length],
+            'params': None if many else [repr(param) for param in params or ()],
+            'many': many,
+            'mongo': describe_mongo(context) if context['connection'].vendor == 'djongo' else None,
+        }
+        logger.warning(json.dumps(entry, default=str))
+
+
+def find_caller():
+    """Return `module.function:line` of the nearest workouts frame on the stack."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith('workouts.') and module not in _IGNORED_MODULES:
+            return f'{module}.{frame.f_code.co_name}:{frame.f_lineno}'
+        frame = frame.f_back
+    return None
+
+
+def _djongo_query(context):
+    # Django's CursorWrapper -> djongo Cursor -> sql2mongo Query -> parsed query
+    cursor = getattr(context['cursor'], 'cursor', None)
+    result = getattr(cursor, 'result', None)
+    return getattr(result, '_query', None)
+
+
+def _open_djongo_cursor(context):
+    """
+    Run a djongo SELECT now rather than on first fetch, so it is timed.
+
+    This reaches into djongo internals; when they do not look as expected,
+    or opening the cursor fails, the query is left for djongo to run as
+    usual and only the timing is less precise.
+    """
+    try:
+        query = _djongo_query(context)
+        if type(query).__name__ == 'SelectQuery' and query._cursor is None:
+            query._cursor = query._get_cursor()
+    except Exception:
+        logger.debug('Could not open the djongo cursor early', exc_info=True)
+
+
+def describe_mongo(context):
+    """
+    Describe the Mongo command djongo translated the last SQL statement into.
+
+    This reads djongo internals, so on any failure the entry carries only
+    the SQL.
+    """
+    try:
+        query = _djongo_query(context)
+        if query is None:
+            return None
+        kind = type(query).__name__
+        described = {'operation': kind, 'collection': getattr(query, 'left_table', None)}
+        if kind == 'SelectQuery':
+            if query._needs_aggregation():
+                described['aggregate'] = query._make_pipeline()
+            else:
+                find = {}
+                for part in (query.where, query.selected_columns, query.limit,
+                             query.order, query.offset):
+                    if part:
+                        find.update(part.to_mongo())
+                described['find'] = find
+        elif kind == 'UpdateQuery':
+            described['update_many'] = query.kwargs
+        elif kind == 'DeleteQuery':
+            described['delete_many'] = query.kw
+        return described
+    except Exception:
+        logger.debug('Could not describe the djongo query', exc_info=True)
+        return None
+
+
+def install(sender=None, connection=None, **kwargs):
+    """connection_created receiver attaching the slow-query wrapper."""
+    config = get_config()
+    if not any(isinstance(wrapper, SlowQueryLogger) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(
+            SlowQueryLogger(config['THRESHOLD_MS'], config['MAX_SQL_LENGTH'])
+        )
+
+
+def view_of(request):
+    """
+    Return (view name, action) of the view a request resolves to.
+
+    The action is the viewset method serving the request (DRF records the
+    method -> action mapping on the view function), else the view function.
+    """
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower()) or getattr(match.func, '__name__', None)
+    return match.view_name or None, action
+
+
+class SlowQueryMiddleware:
+    """Record the view and action of each request for the slow-query log."""
+
+    def __init__(self, get_response):
+        if not get_config()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Resolved up front so that queries of later middleware (sessions,
+        # authentication) are attributed to the view as well
+        token = _view.set(view_of(request))
+        try:
+            return self.get_response(request)
+        finally:
+            _view.reset(token)
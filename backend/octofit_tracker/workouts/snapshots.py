@@ -0,0 +1,250 @@
+"""
+Compact columnar snapshots of a user's workout history.
+
+A snapshot stores every workout of a user (live and archived) as five typed
+arrays: date ordinals, durations, distances, calories and a one-byte
+workout type code. It is kept as one binary blob per user in
+WorkoutSnapshot, so analytics read a few kilobytes and a handful of arrays
+instead of materialising thousands of Workout instances.
+
+Blob layout (little-endian): a header with a magic, the format version and
+the row count, followed by each column's raw array bytes in COLUMNS order.
+
+Each blob records the UserStats version it matches. Creating workouts
+appends them when the write moves the stats to their next version: only a
+blob at the version before the write is extended, and only if it then holds
+as many rows as the stats count, so concurrent writes cannot double or drop
+rows. Updates, deletes and any append that does not fit leave the blob
+behind the stats version, and load() rebuilds it. A store only replaces a
+blob built at an older version, so a slow rebuild never overwrites a newer
+one.
+
+`rebuild_stats` reads the per-type counts and streaks of users with a
+current blob from it, instead of fetching every workout date.
+"""
+import struct
+import sys
+from array import array
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .badges import longest_streak
+from .models import ArchivedWorkout, UserStats, Workout, WorkoutSnapshot
+
+
+MAGIC = b'OFWS'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')
+
+COLUMNS = (
+    ('dates', 'i'),
+    ('durations', 'I'),
+    ('distances', 'd'),
+    ('calories', 'I'),
+    ('types', 'B'),
+)
+
+TYPES = [name for name, _ in Workout.WORKOUT_CHOICES]
+TYPE_CODES = {name: code for code, name in enumerate(TYPES)}
+
+SOURCE_FIELDS = ('date', 'duration', 'distance', 'calories', 'workout_type')
+
+
+class Snapshot:
+    """Workout history of one user as parallel typed arrays."""
+
+    def __init__(self):
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def append(self, day, duration, distance, calories, workout_type):
+        self.dates.append(day.toordinal())
+        self.durations.append(duration)
+        self.distances.append(distance)
+        self.calories.append(calories)
+        self.types.append(TYPE_CODES[workout_type])
+
+    def extend(self, rows):
+        """Append (date, duration, distance, calories, workout_type) tuples."""
+        for row in rows:
+            self.append(*row)
+
+    def to_bytes(self):
+        parts = [HEADER.pack(MAGIC, VERSION, len(self))]
+        for name, _ in COLUMNS:
+            column = getattr(self, name)
+            if sys.byteorder == 'big':
+                column = array(column.typecode, column)
+                column.byteswap()
+            parts.append(column.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, blob):
+        blob = memoryview(blob)
+        magic, version, count = HEADER.unpack_from(blob)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a workout snapshot of a supported version')
+        snapshot = cls()
+        offset = HEADER.size
+        for name, _ in COLUMNS:
+            column = getattr(snapshot, name)
+            size = count * column.itemsize
+            column.frombytes(blob[offset:offset + size])
+            if sys.byteorder == 'big':
+                column.byteswap()
+            offset += size
+        return snapshot
+
+
+def _rows(user_id):
+    for model in (Workout, ArchivedWorkout):
+        yield from model.objects.filter(user_id=user_id).values_list(*SOURCE_FIELDS).iterator()
+
+
+def build(user_id):
+    """Build a snapshot of a user's history from the database."""
+    snapshot = Snapshot()
+    snapshot.extend(_rows(user_id))
+    return snapshot
+
+
+def _stats_version(user_id):
+    return UserStats.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+
+def _store(user_id, snapshot, version):
+    fields = {'workout_count': len(snapshot), 'data': snapshot.to_bytes(), 'stats_version': version}
+    updated = WorkoutSnapshot.objects.filter(
+        user_id=user_id, stats_version__lt=version
+    ).update(updated_at=timezone.now(), **fields)
+    if not updated and not WorkoutSnapshot.objects.filter(user_id=user_id).exists():
+        try:
+            with transaction.atomic():
+                WorkoutSnapshot.objects.create(user_id=user_id, **fields)
+        except IntegrityError:
+            # Another request stored this user's first snapshot meanwhile
+            pass
+    return snapshot
+
+
+def rebuild(user_id):
+    """Rebuild and store a user's snapshot."""
+    # Read the version first: a write committed during the build bumps it
+    # past the stored one, and the next load rebuilds again
+    version = _stats_version(user_id)
+    return _store(user_id, build(user_id), version)
+
+
+def load(user_id):
+    """Return a user's snapshot, rebuilding it when missing or stale."""
+    stored = WorkoutSnapshot.objects.filter(user_id=user_id).values_list(
+        'stats_version', 'data'
+    ).first()
+    if stored is None or stored[0] != _stats_version(user_id):
+        return rebuild(user_id)
+    return Snapshot.from_bytes(stored[1])
+
+
+def append(user_id, workouts, stats):
+    """
+    Append the workouts a create wrote to the user's snapshot.
+
+    `stats` is the UserStats row as that write saved it. Returns the
+    extended snapshot, or None when the blob was missing or did not fit and
+    is left for load() to rebuild.
+    """
+    previous = stats.version - 1
+    blob = WorkoutSnapshot.objects.filter(
+        user_id=user_id, stats_version=previous
+    ).values_list('data', flat=True).first()
+    if blob is None:
+        return None
+    snapshot = Snapshot.from_bytes(blob)
+    snapshot.extend(
+        (workout.date, workout.duration, workout.distance, workout.calories, workout.workout_type)
+        for workout in workouts
+    )
+    if len(snapshot) != stats.workouts_count_alltime:
+        # Another write landed in between
+        return None
+    updated = WorkoutSnapshot.objects.filter(user_id=user_id, stats_version=previous).update(
+        workout_count=len(snapshot),
+        data=snapshot.to_bytes(),
+        stats_version=stats.version,
+        updated_at=timezone.now(),
+    )
+    return snapshot if updated else None
+
+
+def load_current(versions):
+    """
+    Return the stored snapshots matching the given stats versions, by user id.
+
+    `versions` maps user ids to the UserStats version the caller read; users
+    whose blob is missing or at another version are left out.
+    """
+    rows = WorkoutSnapshot.objects.filter(user_id__in=list(versions)).values_list(
+        'user_id', 'stats_version', 'data'
+    )
+    return {
+        user_id: Snapshot.from_bytes(data)
+        for user_id, version, data in rows
+        if versions[user_id] == version
+    }
+
+
+def history(snapshot):
+    """Return the workout count per type name and the sorted distinct dates of a snapshot."""
+    type_counts = [0] * len(TYPES)
+    for code in snapshot.types:
+        type_counts[code] += 1
+    dates = [date.fromordinal(day) for day in sorted(set(snapshot.dates))]
+    return {name: type_counts[code] for code, name in enumerate(TYPES)}, dates
+
+
+def summarize(snapshot, today=None):
+    """
+    Compute the UserStats totals, per-type counts and longest streak of a snapshot.
+
+    Windows match the stats recalculation: the last 7 and 30 days include
+    the workouts dated on the window's first day.
+    """
+    today = today or timezone.now().date()
+    since_7 = (today - timedelta(days=7)).toordinal()
+    since_30 = (today - timedelta(days=30)).toordinal()
+
+    summary = {
+        'total_distance_7days': 0.0, 'total_time_7days': 0, 'workouts_count_7days': 0,
+        'total_distance_30days': 0.0, 'total_time_30days': 0, 'workouts_count_30days': 0,
+    }
+    type_counts = [0] * len(TYPES)
+    for day, duration, distance, code in zip(
+        snapshot.dates, snapshot.durations, snapshot.distances, snapshot.types
+    ):
+        type_counts[code] += 1
+        if day >= since_30:
+            summary['total_distance_30days'] += distance
+            summary['total_time_30days'] += duration
+            summary['workouts_count_30days'] += 1
+            if day >= since_7:
+                summary['total_distance_7days'] += distance
+                summary['total_time_7days'] += duration
+                summary['workouts_count_7days'] += 1
+
+    summary.update({
+        'total_distance_alltime': float(sum(snapshot.distances)),
+        'total_time_alltime': sum(snapshot.durations),
+        'workouts_count_alltime': len(snapshot),
+        'total_calories_alltime': sum(snapshot.calories),
+        'type_counts': {name: type_counts[code] for code, name in enumerate(TYPES)},
+        'longest_streak': longest_streak(
+            [date.fromordinal(day) for day in sorted(set(snapshot.dates))]
+        ),
+    })
+    return summary
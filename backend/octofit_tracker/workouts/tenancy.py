@@ -0,0 +1,52 @@
+"""
+School (tenant) resolution.
+
+Every user belongs to one school through their UserProfile. Workout and
+UserStats rows carry the school too. Leaderboards filter UserStats on it and
+hit its tenant-leading indexes, touching only that school's partition.
+Per-user queries, including every Workout read, are already confined to one
+user and keep using the user-leading indexes.
+"""
+from django.conf import settings
+
+from .models import School, UserProfile
+
+
+def default_school():
+    school, _ = School.objects.get_or_create(
+        slug=settings.OCTOFIT_DEFAULT_SCHOOL,
+        defaults={'name': 'Default School'}
+    )
+    return school
+
+
+def school_id_for_user(user):
+    """Return the id of the user's school, enrolling them in the default school if needed."""
+    cached = getattr(user, '_octofit_school_id', None)
+    if cached is not None:
+        return cached
+    school_id = UserProfile.objects.filter(user=user).values_list('school_id', flat=True).first()
+    if school_id is None:
+        profile, _ = UserProfile.objects.get_or_create(
+            user=user,
+            defaults={'school': default_school()}
+        )
+        school_id = profile.school_id
+    user._octofit_school_id = school_id
+    return school_id
+
+
+def school_id_for_request(request):
+    """
+    Return the school a request is scoped to.
+    
+    Authenticated users always see their own school. Anonymous readers pick
+    one with `?school=<slug>`, falling back to the default school. Returns
+    None for an unknown slug.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return school_id_for_user(user)
+    params = getattr(request, 'query_params', request.GET)
+    slug = params.get('school') or settings.OCTOFIT_DEFAULT_SCHOOL
+    return School.objects.filter(slug=slug).values_list('id', flat=True).first()
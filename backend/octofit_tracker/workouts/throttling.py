@@ -0,0 +1,219 @@
+"""
+Rate limiting and load shedding with token buckets.
+
+Every client (the user, or the client address of anonymous requests) has a
+token bucket per scope: `writes`, `leaderboards` and `exports`. A rate such
+as '30/min' is a bucket of 30 tokens refilled at 30 per minute, so clients
+may burst up to the full budget and are then held to the sustained rate.
+Buckets live in process memory, spread over SHARDS dicts with a lock each,
+so a check is one hash, one short lock and a little arithmetic, with no
+I/O. Each shard keeps at most MAX_KEYS_PER_SHARD buckets and forgets the
+least recently used. A forgotten bucket is full again, which only errs on
+the side of letting a request through.
+
+In-process buckets give each worker its own budget. When CACHE_ALIAS names
+a shared cache backend, requests the local bucket allows are also counted in
+a fixed window per client in that backend (one incr() per request), which
+holds the rate across all processes.
+
+Writes also draw from a process-wide `shed_writes` bucket shared by all
+clients. When writes arrive faster than the process can absorb them, further
+writes are rejected with 429 and Retry-After before they reach the database,
+instead of queueing stats recalculations behind each other. Shedding
+protects each process on its own, so this bucket is never counted in the
+shared cache: one busy worker does not shed the writes of the others.
+
+The DRF throttle classes below are attached per action in views.py; the
+async views call check() directly.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': None,
+    'RATES': {
+        'writes': '30/min',
+        'leaderboards': '120/min',
+        'exports': '10/hour',
+        'shed_writes': '50/s',
+    },
+    'SHARDS': 16,
+    'MAX_KEYS_PER_SHARD': 10000,
+}
+
+KEY_PREFIX = 'octofit:throttle'
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Scopes limited per process only, never in the shared cache
+LOCAL_SCOPES = {'shed_writes'}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'OCTOFIT_THROTTLING', {}))
+    config['RATES'] = {**DEFAULTS['RATES'], **config['RATES']}
+    return config
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """Parse 'N/period' (period s, m, h or d, e.g. '30/min') into (tokens, seconds)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class TokenBuckets:
+    """Token buckets keyed by string, sharded over independently locked dicts."""
+
+    def __init__(self, shards, max_keys_per_shard):
+        self.max_keys_per_shard = max_keys_per_shard
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+
+    def consume(self, key, capacity, refill_per_second):
+        """Take one token; return 0 when taken, else the seconds until one is available."""
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_per_second)
+                buckets.move_to_end(key)
+            if tokens >= 1:
+                buckets[key] = (tokens - 1, now)
+                if len(buckets) > self.max_keys_per_shard:
+                    buckets.popitem(last=False)
+                return 0.0
+            buckets[key] = (tokens, now)
+            return (1 - tokens) / refill_per_second
+
+    def clear(self):
+        for lock, buckets in self._shards:
+            with lock:
+                buckets.clear()
+
+    def __len__(self):
+        return sum(len(buckets) for _, buckets in self._shards)
+
+
+class RateLimiter:
+    """Checks requests against the configured rates, per scope and client."""
+
+    def __init__(self):
+        self._buckets = None
+        self._lock = threading.Lock()
+
+    @property
+    def buckets(self):
+        if self._buckets is None:
+            with self._lock:
+                if self._buckets is None:
+                    config = get_config()
+                    self._buckets = TokenBuckets(config['SHARDS'], config['MAX_KEYS_PER_SHARD'])
+        return self._buckets
+
+    def consume(self, scope, ident):
+        """Take one request of `ident` from the `scope` budget; return the wait in seconds (0 if allowed)."""
+        config = get_config()
+        if not config['ENABLED']:
+            return 0.0
+        capacity, seconds = parse_rate(config['RATES'][scope])
+        key = f'{scope}:{ident}'
+        wait = self.buckets.consume(key, capacity, capacity / seconds)
+        if wait or config['CACHE_ALIAS'] is None or scope in LOCAL_SCOPES:
+            return wait
+        return self._consume_shared(caches[config['CACHE_ALIAS']], key, capacity, seconds)
+
+    @staticmethod
+    def _consume_shared(cache, key, limit, seconds):
+        now = time.time()
+        window = int(now // seconds)
+        cache_key = f'{KEY_PREFIX}:{key}:{window}'
+        try:
+            count = cache.incr(cache_key)
+        except ValueError:
+            # First request of the window
+            count = 1 if cache.add(cache_key, 1, timeout=seconds + 1) else cache.incr(cache_key)
+        if count > limit:
+            return (window + 1) * seconds - now
+        return 0.0
+
+    def reset(self):
+        """Forget this process's buckets."""
+        self.buckets.clear()
+
+
+limiter = RateLimiter()
+
+
+def client_ident(request):
+    """The user id of authenticated requests, else the client address."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'addr:{BaseThrottle().get_ident(request)}'
+
+
+def check(request, scope):
+    """
+    Check a plain Django request against a scope.
+
+    Returns None when allowed, else a 429 response with Retry-After.
+    """
+    wait = limiter.consume(scope, client_ident(request))
+    if not wait:
+        return None
+    seconds = math.ceil(wait)
+    response = JsonResponse(
+        {'detail': f'Request was throttled. Expected available in {seconds} seconds.'},
+        status=429
+    )
+    response['Retry-After'] = str(seconds)
+    return response
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle drawing from the `scope` bucket of the requesting client.
+
+    With `shed_scope` set, requests the client's bucket allows also draw from
+    that process-wide bucket, so one client's rejected requests never use up
+    the shared budget.
+    """
+    scope = None
+    shed_scope = None
+
+    def allow_request(self, request, view):
+        self._wait = limiter.consume(self.scope, client_ident(request))
+        if not self._wait and self.shed_scope:
+            self._wait = limiter.consume(self.shed_scope, '*')
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class WriteThrottle(TokenBucketThrottle):
+    """Creates, updates and deletes; sheds writes when the process is overloaded."""
+    scope = 'writes'
+    shed_scope = 'shed_writes'
+
+
+class LeaderboardThrottle(TokenBucketThrottle):
+    scope = 'leaderboards'
+
+
+class ExportThrottle(TokenBucketThrottle):
+    scope = 'exports'
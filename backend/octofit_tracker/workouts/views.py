@@ -1,19 +1,30 @@
-from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import action
+import csv
+import logging
+
+from rest_framework import viewsets, status, permissions, filters
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Sum, Count
+import django
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum, Count
 
-from .models import Workout, WorkoutType, UserStats
+from .models import Workout, WorkoutType, UserStats, UserBadge
 from django.contrib.auth.models import User
 from .serializers import (
     WorkoutSerializer,
     WorkoutCreateUpdateSerializer,
     WorkoutTypeSerializer,
-    UserStatsSerializer
+    UserStatsSerializer,
+    UserBadgeSerializer
 )
-from django.http import JsonResponse
+# Modules that only some endpoints need (events, leaderboards, archive) are
+# imported where they are used, to keep worker cold starts short
+from . import badges, profiling, idempotency, reference, search, tenancy, throttling
+from .cache import summary_cache
+from .reference import workout_types
+from django.http import Http404, JsonResponse, StreamingHttpResponse, HttpResponseNotAllowed
 from django.middleware.csrf import get_token
 
 
@@ -23,6 +34,116 @@ def csrf_token_view(request):
     return JsonResponse({'csrfToken': token})
 
 
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAdminUser])
+def profiling_stats_view(request):
+    """Return (GET) or reset (DELETE) this process's per-endpoint request profiles."""
+    if request.method == 'DELETE':
+        profiling.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    data = profiling.snapshot()
+    data['enabled'] = profiling.get_config()['ENABLED']
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def cache_stats_view(request):
+    """Return hit/miss/eviction counters of this process's summary cache."""
+    return Response(summary_cache.stats())
+
+
+def leaderboard_stream_view(request):
+    """
+    Stream leaderboard changes as Server-Sent Events.
+    
+    The first event (`snapshot`) carries the current top-N of every board;
+    each `leaderboard` event then carries the changed boards with their
+    diff and new top-N. Comment lines are sent as heartbeats.
+    
+    Each open stream holds a worker thread while it waits for events, so it
+    must be served by threaded WSGI workers. Django before 4.2 iterates
+    streaming responses on the ASGI event loop, where a waiting stream would
+    stall every other request, so ASGI workers refuse it; route this path to
+    the WSGI workers instead.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    # Only ASGIRequest carries the ASGI connection scope
+    if getattr(request, 'scope', None) is not None and django.VERSION < (4, 2):
+        return JsonResponse(
+            {'detail': 'Leaderboard streams are served by the WSGI workers.'},
+            status=503
+        )
+    throttled = throttling.check(request, 'leaderboards')
+    if throttled is not None:
+        return throttled
+    school_id = tenancy.school_id_for_request(request)
+    if school_id is None:
+        return JsonResponse({'detail': 'Unknown school.'}, status=404)
+    from . import events
+    from .leaderboards import tracker as leaderboard_tracker, channel as leaderboard_channel
+    heartbeat = events.get_config()['HEARTBEAT']
+    
+    def stream():
+        # Subscribed only once the response is consumed, and always released
+        subscription = events.get_broker().subscribe(leaderboard_channel(school_id))
+        try:
+            yield 'retry: 5000\n\n'
+            yield events.format_sse('snapshot', leaderboard_tracker.snapshot(school_id))
+            while True:
+                message = subscription.get(timeout=heartbeat)
+                if message is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield events.format_sse('leaderboard', message)
+        finally:
+            subscription.close()
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+logger = logging.getLogger('workouts.stats')
+
+
+LEADERBOARD_DEFAULT_LIMIT = 10
+LEADERBOARD_MAX_LIMIT = 100
+
+
+def leaderboard_limit(value):
+    """Parse a leaderboard `limit` parameter, clamped to 1..LEADERBOARD_MAX_LIMIT; None if invalid."""
+    if value is None:
+        return LEADERBOARD_DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        return None
+    return max(1, min(limit, LEADERBOARD_MAX_LIMIT))
+
+
+EXPORT_FIELDS = [
+    'id', 'date', 'workout_type', 'duration', 'distance', 'calories', 'notes', 'created_at',
+]
+
+
+class _LineBuffer:
+    """File-like object handing each CSV row back to the caller instead of storing it."""
+    
+    def write(self, value):
+        return value
+
+
+def _cached_user_stats(user):
+    """Serialized UserStats of a user (None if missing), served from the summary cache."""
+    def compute():
+        stats = UserStats.objects.select_related('user').filter(user=user).first()
+        return dict(UserStatsSerializer(stats).data) if stats else None
+    return summary_cache.get_or_compute(user.pk, 'stats', compute)
+
+
 class WorkoutViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Workout CRUD operations.
@@ -34,7 +155,8 @@ class WorkoutViewSet(viewsets.ModelViewSet):
     serializer_class = WorkoutSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filterset_fields = ['date', 'workout_type']
-    search_fields = ['notes']
+    # ?search= is answered from the notes index (see workouts/search.py)
+    filter_backends = [filters.OrderingFilter, search.WorkoutSearchFilter]
     ordering_fields = ['date', 'created_at']
     ordering = ['-date']
     
@@ -52,14 +174,74 @@ class WorkoutViewSet(viewsets.ModelViewSet):
             return WorkoutCreateUpdateSerializer
         return WorkoutSerializer
     
+    def get_throttles(self):
+        """Rate-limit writes (and shed them under overload) before they reach the database."""
+        if self.request.method not in permissions.SAFE_METHODS:
+            return [throttling.WriteThrottle()]
+        return super().get_throttles()
+    
+    def create(self, request, *args, **kwargs):
+        """
+        Create a workout, answering client retries from stored results.
+        
+        A retry carrying a known Idempotency-Key replays the stored response;
+        a workout identical to an existing one is answered with that workout
+        (200 instead of 201). Neither runs the write or the stats update.
+        """
+        key = idempotency.get_key(request)
+        if key:
+            fingerprint = idempotency.request_hash(request)
+            replayed = idempotency.replay(request.user, key, fingerprint)
+            if replayed is not None:
+                return replayed
+        
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        duplicate = idempotency.find_duplicate(request.user, serializer.validated_data)
+        if duplicate is None:
+            try:
+                self.perform_create(serializer)
+            except IntegrityError:
+                # A concurrent retry inserted the same workout first
+                duplicate = idempotency.find_duplicate(request.user, serializer.validated_data)
+                if duplicate is None:
+                    raise
+        if duplicate is not None:
+            response = Response(
+                self.get_serializer(duplicate).data,
+                status=status.HTTP_200_OK,
+                headers={idempotency.REPLAY_HEADER: 'true'}
+            )
+        else:
+            response = Response(
+                serializer.data,
+                status=status.HTTP_201_CREATED,
+                headers=self.get_success_headers(serializer.data)
+            )
+        
+        if key:
+            idempotency.store(request.user, key, fingerprint, response)
+        return response
+    
     def perform_create(self, serializer):
         """Automatically set the user to the authenticated user."""
-        serializer.save(user=self.request.user)
-        self._update_user_stats(self.request.user)
+        workout = serializer.save(
+            user=self.request.user,
+            school_id=tenancy.school_id_for_user(self.request.user)
+        )
+        self._update_user_stats(self.request.user, created=[workout])
     
     def perform_update(self, serializer):
         """Update and recalculate stats."""
-        serializer.save()
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            # The new content matches another of the user's workouts
+            raise idempotency.DuplicateWorkout(idempotency.find_duplicate(
+                self.request.user,
+                {field: getattr(serializer.instance, field) for field in idempotency.CONTENT_FIELDS}
+            ))
         self._update_user_stats(self.request.user)
     
     def perform_destroy(self, instance):
@@ -68,8 +250,57 @@ class WorkoutViewSet(viewsets.ModelViewSet):
         self._update_user_stats(self.request.user)
     
     @staticmethod
-    def _update_user_stats(user):
-        """Recalculate user stats based on workouts."""
+    def _update_user_stats(user, created=None):
+        """
+        Recalculate user stats based on workouts.
+        
+        `created` are the workouts a create wrote, folded into the per-type
+        counts and streak without re-scanning the history (see
+        badges.history_fields) and appended to the workout snapshot.
+        Returns the saved UserStats.
+        
+        Concurrent writes for the same user are reconciled optimistically,
+        without locks: the aggregates are computed after reading the row's
+        version and written with a compare-and-swap. A writer that loses the
+        race re-reads and recomputes once. If it loses again, the winner read
+        a version saved after this writer's first read, so the winner's
+        aggregates already include this writer's workouts; the row is then
+        re-read instead of recomputed. The incrementally kept badge counters
+        cannot be re-read that way, so they are marked stale for the next
+        write to rescan.
+        """
+        school_id = tenancy.school_id_for_user(user)
+        for attempt in range(2):
+            user_stats, _ = UserStats.objects.get_or_create(
+                user=user,
+                defaults={'school_id': school_id}
+            )
+            fields = WorkoutViewSet._calculate_user_stats(user, user_stats)
+            fields.update(badges.history_fields(user_stats, created))
+            if user_stats.compare_and_swap(school_id=school_id, **fields):
+                if created:
+                    from . import snapshots
+                    snapshots.append(user.pk, created, user_stats)
+                break
+            logger.debug('Stats update conflict for user %s (attempt %d)', user.pk, attempt + 1)
+        else:
+            # Bumping the version also fails any in-flight compare-and-swap
+            # that would clear the flag with counters missing these rows
+            UserStats.objects.filter(pk=user_stats.pk).update(
+                history_stale=True,
+                version=F('version') + 1
+            )
+            user_stats.refresh_from_db()
+        
+        badges.evaluate_badges(user_stats)
+        summary_cache.bump(user.pk)
+        from .leaderboards import tracker as leaderboard_tracker
+        leaderboard_tracker.stats_changed(user_stats)
+        return user_stats
+    
+    @staticmethod
+    def _calculate_user_stats(user, user_stats):
+        """Aggregate a user's workouts into UserStats field values."""
         today = timezone.now().date()
         seven_days_ago = today - timedelta(days=7)
         thirty_days_ago = today - timedelta(days=30)
@@ -105,60 +336,200 @@ class WorkoutViewSet(viewsets.ModelViewSet):
             calories=Sum('calories')
         )
         
-        # Update or create UserStats
-        user_stats, _ = UserStats.objects.get_or_create(user=user)
-        user_stats.total_distance_7days = stats_7days['distance'] or 0.0
-        user_stats.total_time_7days = stats_7days['time'] or 0
-        user_stats.workouts_count_7days = stats_7days['count'] or 0
+        return {
+            'total_distance_7days': stats_7days['distance'] or 0.0,
+            'total_time_7days': stats_7days['time'] or 0,
+            'workouts_count_7days': stats_7days['count'] or 0,
+            
+            'total_distance_30days': stats_30days['distance'] or 0.0,
+            'total_time_30days': stats_30days['time'] or 0,
+            'workouts_count_30days': stats_30days['count'] or 0,
+            
+            # All-time totals include the workouts moved to the archive
+            'total_distance_alltime': (stats_alltime['distance'] or 0.0) + user_stats.archived_distance,
+            'total_time_alltime': (stats_alltime['time'] or 0) + user_stats.archived_time,
+            'workouts_count_alltime': (stats_alltime['count'] or 0) + user_stats.archived_count,
+            'total_calories_alltime': (stats_alltime['calories'] or 0) + user_stats.archived_calories,
+        }
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create many workouts in one request.
+        
+        Workouts identical to stored ones (or repeated within the batch) are
+        skipped, and stats are recalculated once for the whole batch. The
+        Idempotency-Key header is honoured for the batch as a whole.
+        """
+        key = idempotency.get_key(request)
+        if key:
+            fingerprint = idempotency.request_hash(request)
+            replayed = idempotency.replay(request.user, key, fingerprint)
+            if replayed is not None:
+                return replayed
         
-        user_stats.total_distance_30days = stats_30days['distance'] or 0.0
-        user_stats.total_time_30days = stats_30days['time'] or 0
-        user_stats.workouts_count_30days = stats_30days['count'] or 0
+        serializer = WorkoutCreateUpdateSerializer(
+            data=request.data,
+            many=True,
+            context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data
+        existing = idempotency.find_duplicates(request.user, items)
         
-        user_stats.total_distance_alltime = stats_alltime['distance'] or 0.0
-        user_stats.total_time_alltime = stats_alltime['time'] or 0
-        user_stats.workouts_count_alltime = stats_alltime['count'] or 0
-        user_stats.total_calories_alltime = stats_alltime['calories'] or 0
+        school_id = tenancy.school_id_for_user(request.user)
+        new_workouts = []
+        for item in items:
+            content = idempotency.content_key(item)
+            if content in existing:
+                continue
+            workout = Workout(user=request.user, school_id=school_id, **item)
+            existing[content] = workout
+            new_workouts.append(workout)
         
-        user_stats.save()
+        conflicted = False
+        if new_workouts:
+            try:
+                with transaction.atomic():
+                    Workout.objects.bulk_create(new_workouts)
+            except IntegrityError:
+                # A concurrent request stored some of these workouts first
+                new_workouts = self._insert_each(new_workouts)
+                conflicted = True
+        if new_workouts:
+            if new_workouts[0].pk is None:
+                # Backends that do not return ids from bulk inserts
+                created = idempotency.find_duplicates(request.user, [
+                    {field: getattr(workout, field) for field in idempotency.CONTENT_FIELDS}
+                    for workout in new_workouts
+                ])
+                new_workouts = list(created.values())
+            search.index_workouts(new_workouts)
+            self._update_user_stats(
+                request.user,
+                # Rows skipped as conflicts may be our own on backends
+                # without transactions, so rescan the history instead
+                created=None if conflicted else new_workouts
+            )
+        
+        response = Response(
+            {
+                'created': len(new_workouts),
+                'duplicates': len(items) - len(new_workouts),
+            },
+            status=status.HTTP_201_CREATED if new_workouts else status.HTTP_200_OK
+        )
+        if key:
+            idempotency.store(request.user, key, fingerprint, response)
+        return response
+    
+    @staticmethod
+    def _insert_each(workouts):
+        """Insert workouts one at a time, skipping those already stored; return the inserted ones."""
+        inserted = []
+        for workout in workouts:
+            try:
+                with transaction.atomic():
+                    Workout.objects.bulk_create([workout])
+            except IntegrityError:
+                continue
+            inserted.append(workout)
+        return inserted
     
     @action(detail=False, methods=['get'])
     def by_date(self, request):
-        """Filter workouts by date range."""
+        """Filter workouts by date range, including archived workouts."""
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
         
-        queryset = self.get_queryset()
-        if start_date:
-            queryset = queryset.filter(date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(date__lte=end_date)
-        
-        serializer = self.get_serializer(queryset, many=True)
+        if not request.user.is_authenticated:
+            return Response([])
+        from . import archive
+        workouts = archive.history(request.user, start_date, end_date)
+        serializer = self.get_serializer(workouts, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], throttle_classes=[throttling.ExportThrottle])
+    def export(self, request):
+        """Download workouts in a date range as CSV, including archived workouts."""
+        if not request.user.is_authenticated:
+            return Response(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        from . import archive
+        workouts = archive.history(
+            request.user,
+            request.query_params.get('start_date'),
+            request.query_params.get('end_date')
+        )
+        
+        def rows():
+            buffer = _LineBuffer()
+            writer = csv.writer(buffer)
+            yield writer.writerow(EXPORT_FIELDS)
+            for workout in workouts:
+                yield writer.writerow([getattr(workout, field) for field in EXPORT_FIELDS])
+        
+        response = StreamingHttpResponse(rows(), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="workouts.csv"'
+        return response
+    
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get workout statistics for the authenticated user."""
-        try:
-            stats = UserStats.objects.get(user=request.user)
-            serializer = UserStatsSerializer(stats)
-            return Response(serializer.data)
-        except UserStats.DoesNotExist:
+        data = _cached_user_stats(request.user)
+        if data is None:
             return Response(
                 {'detail': 'No statistics found for this user.'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response(data)
 
 
 class WorkoutTypeViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for WorkoutType (read-only).
     Lists available workout types.
+    
+    Served from the in-process reference registry, with an ETag and a
+    long Cache-Control lifetime, so steady-state reads run no queries.
     """
     queryset = WorkoutType.objects.all()
     serializer_class = WorkoutTypeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    
+    def _cacheable(self, request, render):
+        """Answer 304 when the client holds the current data, else render it with caching headers."""
+        etag = workout_types.etag
+        headers = {
+            'ETag': etag,
+            'Cache-Control': f'public, max-age={reference.get_config()["MAX_AGE"]}',
+        }
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response = render()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+    
+    def list(self, request, *args, **kwargs):
+        def render():
+            types = workout_types.all()
+            page = self.paginate_queryset(types)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+            return Response(self.get_serializer(types, many=True).data)
+        return self._cacheable(request, render)
+    
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            workout_type = workout_types.get_by_pk(int(kwargs['pk']))
+        except ValueError:
+            workout_type = None
+        if workout_type is None:
+            raise Http404
+        return self._cacheable(request, lambda: Response(self.get_serializer(workout_type).data))
 
 
 class UserStatsViewSet(viewsets.ReadOnlyModelViewSet):
@@ -170,48 +541,58 @@ class UserStatsViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
     def get_queryset(self):
-        """Return stats, optionally filtered by period."""
-        return UserStats.objects.all()
+        """Return the stats of the requesting school."""
+        school_id = tenancy.school_id_for_request(self.request)
+        if school_id is None:
+            return UserStats.objects.none()
+        return UserStats.objects.filter(school_id=school_id).select_related('user')
+    
+    def _leaderboard(self, request, field):
+        """Top users of the requesting school ordered by a UserStats field."""
+        limit = leaderboard_limit(request.query_params.get('limit'))
+        if limit is None:
+            return Response(
+                {'detail': 'limit must be an integer.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        leaderboard = self.get_queryset().order_by(f'-{field}')[:limit]
+        serializer = self.get_serializer(leaderboard, many=True)
+        return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def my_stats(self, request):
         """Get stats for the authenticated user."""
-        try:
-            stats = UserStats.objects.get(user=request.user)
-            serializer = self.get_serializer(stats)
-            return Response(serializer.data)
-        except UserStats.DoesNotExist:
+        data = _cached_user_stats(request.user)
+        if data is None:
             return Response(
                 {'detail': 'No statistics found for this user.'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response(data)
     
     @action(detail=False, methods=['get'])
+    def my_badges(self, request):
+        """Get the badges earned by the authenticated user."""
+        if not request.user.is_authenticated:
+            return Response(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        earned = UserBadge.objects.filter(user=request.user)
+        serializer = UserBadgeSerializer(earned, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], throttle_classes=[throttling.LeaderboardThrottle])
     def leaderboard_7days(self, request):
         """Get leaderboard for top distance in last 7 days."""
-        limit = int(request.query_params.get('limit', 10))
-        leaderboard = UserStats.objects.order_by(
-            '-total_distance_7days'
-        )[:limit]
-        serializer = self.get_serializer(leaderboard, many=True)
-        return Response(serializer.data)
+        return self._leaderboard(request, 'total_distance_7days')
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], throttle_classes=[throttling.LeaderboardThrottle])
     def leaderboard_30days(self, request):
         """Get leaderboard for top distance in last 30 days."""
-        limit = int(request.query_params.get('limit', 10))
-        leaderboard = UserStats.objects.order_by(
-            '-total_distance_30days'
-        )[:limit]
-        serializer = self.get_serializer(leaderboard, many=True)
-        return Response(serializer.data)
+        return self._leaderboard(request, 'total_distance_30days')
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], throttle_classes=[throttling.LeaderboardThrottle])
     def leaderboard_alltime(self, request):
         """Get all-time leaderboard."""
-        limit = int(request.query_params.get('limit', 10))
-        leaderboard = UserStats.objects.order_by(
-            '-total_distance_alltime'
-        )[:limit]
-        serializer = self.get_serializer(leaderboard, many=True)
-        return Response(serializer.data)
+        return self._leaderboard(request, 'total_distance_alltime')
@@ -0,0 +1,113 @@
+"""
+Warm a worker before it accepts traffic.
+
+Without warming, the first request of every new process pays for importing
+the views and serializers behind the URLconf, opening the database
+connection (and, on djongo, loading its SQL parser on the first query),
+loading the reference registry and connecting to the cache and event
+broker. warm_up() does that work up front; wsgi.py and asgi.py call it when
+OCTOFIT_WARMUP is set.
+
+The database connections opened while warming are closed again afterwards.
+A server that preloads the application and then forks its workers would
+otherwise share one MongoClient between processes, and requests open their
+own connections anyway unless CONN_MAX_AGE is set. What stays warm is the
+imported code and the one-time setup behind the first query.
+
+Each step is timed, and a failing step is logged and skipped so that a
+worker still starts when, say, the cache is unreachable.
+"""
+import asyncio
+import logging
+import threading
+from time import perf_counter
+
+from django.core.cache import caches
+from django.db import connections
+from django.urls import get_resolver
+
+
+logger = logging.getLogger('workouts.warmup')
+
+
+def _urlconf():
+    # Resolving every pattern imports all view modules
+    get_resolver().reverse_dict
+
+
+def _databases():
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+def _orm():
+    # A first ORM query, which loads djongo's SQL translation on MongoDB
+    from .models import Workout
+    Workout.objects.filter(pk=0).exists()
+
+
+def _reference():
+    from .reference import workout_types
+    workout_types.all()
+
+
+def _caches():
+    for alias in caches:
+        caches[alias].get('octofit:warmup')
+
+
+def _broker():
+    from .events import get_broker
+    get_broker()
+
+
+STEPS = [
+    ('urlconf', _urlconf),
+    ('databases', _databases),
+    ('orm', _orm),
+    ('reference', _reference),
+    ('caches', _caches),
+    ('broker', _broker),
+]
+
+
+def _run():
+    timings = {}
+    for name, step in STEPS:
+        started = perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception('Warm-up step %s failed', name)
+            continue
+        timings[name] = (perf_counter() - started) * 1000
+    return timings
+
+
+def _run_and_close():
+    try:
+        return _run()
+    finally:
+        connections.close_all()
+
+
+def warm_up():
+    """Run every warm-up step and return their durations in milliseconds, by step."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        timings = _run_and_close()
+    else:
+        # The ORM refuses to run inside an event loop (ASGI servers import
+        # the application from one), so warm up from a separate thread
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(_run_and_close()))
+        thread.start()
+        thread.join()
+        timings = result
+    logger.info(
+        'Warm-up finished in %.1f ms (%s)',
+        sum(timings.values()),
+        ', '.join(f'{name} {elapsed:.1f} ms' for name, elapsed in timings.items())
+    )
+    return timings